@@ -2,8 +2,12 @@
 CrewAI Agent Definitions for Device Support Service
 """
 from crewai import Agent
-from langchain_openai import ChatOpenAI
 from rag_service import RAGService
+from llm_pool import get_llm
+from config import config
+from templates import agent_templates
+from kb_tool import KnowledgeBaseTool, SearchMemo
+from cassette import cassette_llm
 
 # Define supported devices
 SUPPORTED_DEVICES = ["EH222", "EH130", "EH330"]
@@ -14,136 +18,112 @@ DEVICE_DESCRIPTIONS = {
 }
 
 
-def create_device_agent(rag_service: RAGService = None) -> Agent:
+def _default_llm(agent: str = None, stream: bool = False):
     """
-    Create Device Agent that identifies and confirms the device type
+    LLM configured for an agent (see Config.agent_config), sharing the pooled provider client
+    
+    Args:
+        agent: "device", "symptom", "problem_solver" or None for the default settings
+        stream: Stream the response
+    """
+    settings = config.agent_config(agent)
+    params = {}
+    if settings.max_tokens:
+        params["max_tokens"] = settings.max_tokens
+    if settings.timeout:
+        params["timeout"] = settings.timeout
+    if settings.stop:
+        params["stop"] = list(settings.stop)
+    
+    def build():
+        return get_llm(settings.model, temperature=settings.temperature, stream=stream, **params)
+    
+    # Record or replay the calls when a cassette is configured (LLM_CASSETTE_MODE)
+    return cassette_llm(settings.model, build) or build()
+
+
+_llm_factory = _default_llm
+
+
+def set_llm_factory(factory=None):
     """
-    device_list = ", ".join([f"{d} ({DEVICE_DESCRIPTIONS[d]})" for d in SUPPORTED_DEVICES])
+    Override how agent LLMs are created, e.g. with a fake LLM for offline load tests
     
+    Args:
+        factory: Callable(agent=None, stream=False) returning an LLM, or None to restore the default
+    """
+    global _llm_factory
+    _llm_factory = factory or _default_llm
+
+
+def create_summary_llm():
+    """LLM used to summarize older conversation turns (see memory.py)"""
+    return _llm_factory(agent=None, stream=False)
+
+
+def create_extraction_llm():
+    """LLM used to extract symptom slots from a message (see slot_extractor.py)"""
+    return _llm_factory(agent="symptom", stream=False)
+
+
+def device_catalog() -> tuple:
+    """Supported devices as (device id, description) pairs, the key of the template cache"""
+    return tuple((device, DEVICE_DESCRIPTIONS[device]) for device in SUPPORTED_DEVICES)
+
+
+def _agent_from_template(kind: str, stream: bool, tools: list = None) -> Agent:
+    template = agent_templates(device_catalog())[kind]
+    # Iteration and time limits apply to any LLM, including one from a custom factory
+    settings = config.agent_config(kind)
     return Agent(
-        role="Device Support Specialist",
-        goal="Identify, confirm, and understand what specific device the user has and what problem they are experiencing",
-        backstory=f"""You are an experienced device support specialist. You work with the following supported devices:
-        {device_list}
-        
-        Your job is to:
-        1. Ask the user which device they have from the supported list
-        2. CONFIRM they selected the correct device (very important!)
-        3. Be absolutely certain before moving forward
-        
-        Supported devices: {', '.join(SUPPORTED_DEVICES)}
-        
-        IMPORTANT: Always show the device list to users and get explicit confirmation 
-        of the correct device model before proceeding. Ask "Is this correct?" and wait for confirmation.
-        Be friendly and professional. Ask one question at a time.""",
-        llm=ChatOpenAI(model="gpt-4", temperature=0.3),
+        role=template.role,
+        goal=template.goal,
+        backstory=template.backstory,
+        llm=_llm_factory(agent=kind, stream=stream),
+        tools=tools or [],
+        max_iter=settings.max_iterations,
+        max_execution_time=settings.max_execution_time or None,
         verbose=True,
         allow_delegation=False,
     )
 
 
-def create_symptom_agent(rag_service: RAGService = None) -> Agent:
+def create_device_agent(rag_service: RAGService = None, stream: bool = False) -> Agent:
+    """
+    Create Device Agent that identifies and confirms the device type
+    """
+    return _agent_from_template("device", stream)
+
+
+def create_symptom_agent(rag_service: RAGService = None, stream: bool = False) -> Agent:
     """
     Create Problem and Symptom Agent that gathers detailed problem information
     """
-    return Agent(
-        role="Symptom and Problem Specialist",
-        goal="Gather detailed information about the device problem and symptoms by asking step-by-step questions",
-        backstory="""You are an experienced technical support specialist who excels at gathering 
-        detailed symptom information through structured, step-by-step questioning.
-        
-        IMPORTANT - You MUST ask questions ONE AT A TIME, waiting for the user's response to each 
-        question before asking the next one. Never ask multiple questions in a single response.
-        
-        Your question sequence:
-        1. "Could you tell me more about the specific symptoms or error messages you are seeing?"
-        2. "When did you first notice this problem?"
-        3. "Are there any specific actions that seem to trigger this problem or make it worse or better?"
-        4. "Have there been any recent changes to your device, such as software updates or physical modifications?"
-        5. "Could you walk me through the exact sequence of events leading up to when the problem occurs?"
-        6. "Is this issue intermittent, or does it happen constantly?"
-        7. "Are there any other details you think might be relevant to diagnosing this problem?"
-        
-        After each user response ask the NEXT question. Be short, crisp 
-        and empathetic. Only move to the next question after receiving their answer.
-        
-        After all 7 questions, summarize all the symptom information you've gathered.""",
-        llm=ChatOpenAI(model="gpt-4", temperature=0.3),
-        verbose=True,
-        allow_delegation=False,
-    )
+    return _agent_from_template("symptom", stream)
 
 
-def create_problem_solver_agent(rag_service: RAGService = None) -> Agent:
+def create_problem_solver_agent(rag_service: RAGService = None, stream: bool = False, tools: list = None) -> Agent:
     """
     Create Problem Solver Agent that provides repair steps and solutions
+    
+    Args:
+        rag_service: Optional RAG service
+        stream: Stream the response
+        tools: Tools the agent may call, e.g. the knowledge base tool (see create_rag_query_tool)
     """
-    return Agent(
-        role="Technical Problem Solver",
-        goal="Guide the user through repair steps ONE AT A TIME, waiting for feedback before proceeding to the next step",
-        backstory="""You are an expert human-like troubleshooter who guides users through fixing problems step-by-step.
-        
-        IMPORTANT - You guide users through troubleshooting like a real tech support specialist would:
-        
-        Your step-by-step approach:
-        1. Start with the EASIEST troubleshooting step first
-        2. Clearly explain that ONE step - what they need to do, why, and any precautions
-        3. Tell them to try it and report back
-        4. WAIT for their response on whether it worked
-        5. If successful - celebrate and end the support session
-        6. If NOT successful - DIRECTLY move to the NEXT most appropriate troubleshooting step
-        7. Repeat until the problem is solved or escalation is needed
-        
-        CRITICAL RULES:
-        - NEVER provide all solutions at once
-        - NEVER list multiple steps for the user to choose from
-        - ONLY suggest ONE troubleshooting step at a time
-        - Wait for user feedback after each step before proceeding
-        - Be encouraging and supportive throughout
-        - Explain the reasoning behind each step, but very short
-        - Escalate to professional repair only when absolutely necessary
-        
-        You have access to a comprehensive database of device solutions and troubleshooting guides.""",
-        llm=ChatOpenAI(model="gpt-4", temperature=0.3),
-        verbose=True,
-        allow_delegation=False,
-    )
+    return _agent_from_template("problem_solver", stream, tools)
 
 
-def create_rag_query_tool(rag_service: RAGService):
-    """
-    Create a simple RAG query tool without decorators
-    Returns a callable function that searches the knowledge base
+def create_rag_query_tool(rag_service: RAGService, memo: SearchMemo = None) -> KnowledgeBaseTool:
     """
-    def search_knowledge_base(device_type: str, problem_description: str) -> str:
-        """
-        Search the knowledge base for existing solutions
-        
-        Args:
-            device_type: Type of device (e.g., 'Laptop', 'Router')
-            problem_description: Detailed description of the problem
-            
-        Returns:
-            Formatted string with relevant solutions from the knowledge base
-        """
-        if not rag_service:
-            return "No RAG service available."
-            
-        solutions = rag_service.search_solutions(device_type, problem_description, limit=3)
-        
-        if not solutions:
-            return "No matching solutions found in the knowledge base."
-        
-        result = "Found relevant solutions:\n\n"
-        for i, sol in enumerate(solutions, 1):
-            result += f"Solution {i} (Relevance: {sol['score']:.2f}):\n"
-            result += f"  Problem: {sol['problem']}\n"
-            result += f"  Solution: {sol['solution']}\n"
-            if sol.get('manual_reference'):
-                result += f"  Manual Reference: {sol['manual_reference']}\n"
-            result += "\n"
-        
-        return result
+    Create the knowledge base search tool for the problem solver agent
     
-    return search_knowledge_base
+    Args:
+        rag_service: RAG service to search
+        memo: Search results to share with other tools of the same session (a new memo if None)
+    
+    Returns:
+        CrewAI tool; call new_turn() on it at the start of every turn to reset its search budget
+    """
+    return KnowledgeBaseTool(rag_service=rag_service, memo=memo or SearchMemo())
 
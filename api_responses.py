@@ -0,0 +1,114 @@
+"""
+Response encoding for the CrewAI API
+orjson-based JSON responses and negotiated gzip/deflate compression of large bodies
+"""
+import json
+import zlib
+from typing import Any, Optional
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+# Encodings we can produce, in order of preference when the client rates them equally
+SUPPORTED_ENCODINGS = ("gzip", "deflate")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class DeflateResponder(GZipResponder):
+    """Compresses the response body with zlib (HTTP "deflate")"""
+    content_encoding = "deflate"
+
+    @property
+    def compressor(self):
+        if self._compressor is None:
+            self._compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, zlib.MAX_WBITS)
+        return self._compressor
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the content encoding for an Accept-Encoding header
+
+    Args:
+        accept_encoding: Header value, e.g. "gzip;q=0.5, deflate"
+
+    Returns:
+        "gzip", "deflate" or None for an uncompressed response
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Compress responses of at least minimum_size bytes with the client's preferred encoding"""
+
+    def __init__(self, app, minimum_size: int = 1024, compresslevel: int = 6):
+        """
+        Args:
+            app: ASGI application to wrap
+            minimum_size: Smaller bodies are sent uncompressed
+            compresslevel: zlib compression level (1 fastest - 9 smallest)
+        """
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        responder_class = {"gzip": GZipResponder, "deflate": DeflateResponder}.get(encoding)
+        if responder_class is None:
+            responder = IdentityResponder(
+                self.app, self.minimum_size, exclude_content_types=self.exclude_content_types
+            )
+        else:
+            responder = responder_class(
+                self.app,
+                self.minimum_size,
+                compresslevel=self.compresslevel,
+                thread_minimum_size=self.thread_minimum_size,
+                exclude_content_types=self.exclude_content_types,
+            )
+        await responder(scope, receive, send)
@@ -4,8 +4,20 @@ A modern chatbot UI for the CrewAI multiagent device support system
 """
 import streamlit as st
 import os
+import time
 import requests
 from dotenv import load_dotenv
+from crewai import Crew
+from config import config
+from agents import create_device_agent, create_symptom_agent, create_problem_solver_agent, device_catalog
+from device_matcher import identify_device, parse_confirmation
+from memory import create_memory
+from rag_service import RAGService
+from tasks import create_device_identification_task, create_symptom_summary_task, create_problem_solver_task
+from questionnaire import SymptomQuestionnaire
+from slot_extractor import extract_slots
+from intent import INTENT_SOLVED, get_classifier
+from retrieval_state import RetrievalState
 
 # Disable CrewAI telemetry
 os.environ["CREWAI_TELEMETRY_OPT_OUT"] = "true"
@@ -15,6 +27,8 @@ load_dotenv()
 
 # API Configuration
 CREWAI_API_URL = os.getenv("CREWAI_API_URL", "http://localhost:8000")
+CREWAI_JOB_TIMEOUT = float(os.getenv("CREWAI_JOB_TIMEOUT", "600"))
+CREWAI_JOB_POLL_INTERVAL = float(os.getenv("CREWAI_JOB_POLL_INTERVAL", "1.0"))
 
 def call_crewai_api(user_message: str, conversation_history: list = []) -> dict:
     """
@@ -28,16 +42,31 @@ def call_crewai_api(user_message: str, conversation_history: list = []) -> dict:
         API response with the agent's response
     """
     try:
+        # Submit as a job and poll, so long crew runs don't hit HTTP timeouts
         response = requests.post(
-            f"{CREWAI_API_URL}/process-issue",
+            f"{CREWAI_API_URL}/jobs",
             json={
                 "user_message": user_message,
-                "conversation_history": conversation_history
+                "conversation_history": conversation_history,
+                # Let the API stop the crew once we stop polling for it
+                "deadline_seconds": CREWAI_JOB_TIMEOUT
             },
-            timeout=120
+            timeout=10
         )
         response.raise_for_status()
-        return response.json()
+        status_url = f"{CREWAI_API_URL}{response.json()['status_url']}"
+        
+        deadline = time.monotonic() + CREWAI_JOB_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(CREWAI_JOB_POLL_INTERVAL)
+            job = requests.get(status_url, timeout=10)
+            job.raise_for_status()
+            job = job.json()
+            if job["status"] == "succeeded":
+                return {"success": True, "response": job["result"]}
+            if job["status"] == "failed":
+                return {"success": False, "response": f"❌ Error processing request: {job['error']}"}
+        raise requests.exceptions.Timeout()
     except requests.exceptions.ConnectionError:
         return {
             "success": False,
@@ -637,14 +666,17 @@ if "symptom_agent" not in st.session_state:
 if "problem_solver_agent" not in st.session_state:
     st.session_state.problem_solver_agent = None
 
-if "symptom_conversation_history" not in st.session_state:
-    st.session_state.symptom_conversation_history = []
+if "questionnaire" not in st.session_state:
+    st.session_state.questionnaire = SymptomQuestionnaire(extractor=lambda text: extract_slots(text).answers())
 
 if "symptom_questions_count" not in st.session_state:
     st.session_state.symptom_questions_count = 0
 
-if "problem_solving_history" not in st.session_state:
-    st.session_state.problem_solving_history = []
+if "solving_memory" not in st.session_state:
+    st.session_state.solving_memory = create_memory("solving")
+
+if "retrieval_state" not in st.session_state:
+    st.session_state.retrieval_state = None
 
 if "problem_solving_step" not in st.session_state:
     st.session_state.problem_solving_step = 0
@@ -669,6 +701,8 @@ if not st.session_state.agents_ready:
                     api_key=qdrant_api_key
                 )
                 st.session_state.rag_service = rag_service
+                # Running query of the user's turns, each embedded once
+                st.session_state.retrieval_state = RetrievalState(rag_service)
             except Exception as e:
                 st.warning(f"RAG Service unavailable: {str(e)[:50]}...")
                 st.session_state.rag_service = None
@@ -869,53 +903,38 @@ If you have other devices or encounter similar issues in the future, our profess
                         elif st.session_state.current_stage == "device_confirmed" and st.session_state.agents_ready:
                             with st.spinner("🔄 Gathering symptom details..."):
                                 try:
-                                    conversation_context = "\n".join(st.session_state.symptom_conversation_history)
-                                    
-                                    symptom_task = create_symptom_gathering_task(
-                                        st.session_state.symptom_agent,
-                                        f"Device: {st.session_state.device_confirmed}\n\nPrevious conversation:\n{conversation_context}"
-                                    )
-                                    
-                                    symptom_crew = Crew(
-                                        agents=[st.session_state.symptom_agent],
-                                        tasks=[symptom_task],
-                                        verbose=False,
-                                    )
-                                    
-                                    symptom_result = symptom_crew.kickoff(
-                                        inputs={
-                                            "user_response": user_input,
-                                            "device_info": st.session_state.device_confirmed,
-                                            "conversation_history": conversation_context
-                                        }
-                                    )
+                                    questionnaire = st.session_state.questionnaire
+                                    # A bare "yes" answers the device confirmation question, not a symptom question
+                                    is_confirmation = not questionnaire.started and \
+                                        parse_confirmation(user_input) is not None and len(user_input.split()) <= 3
+                                    question = questionnaire.respond("" if is_confirmation else user_input)
+                                    st.session_state.symptom_questions_count = questionnaire.answered
+                                    if st.session_state.retrieval_state and not is_confirmation:
+                                        st.session_state.retrieval_state.add_turn(user_input)
                                     
-                                    symptom_response = str(symptom_result)
+                                    if question:
+                                        symptom_response = question
+                                    else:
+                                        # All questions answered: one LLM call summarizes them
+                                        summary_task = create_symptom_summary_task(
+                                            st.session_state.symptom_agent,
+                                            st.session_state.device_confirmed,
+                                            questionnaire.render()
+                                        )
+                                        summary_crew = Crew(
+                                            agents=[st.session_state.symptom_agent],
+                                            tasks=[summary_task],
+                                            verbose=False,
+                                        )
+                                        symptom_response = str(summary_crew.kickoff(inputs={}))
+                                        st.session_state.symptoms_gathered = f"{questionnaire.render()}\n\nSummary: {symptom_response}"
+                                        st.session_state.current_stage = "symptoms_gathered"
                                     
                                     st.session_state.messages.append({
                                         "role": "agent",
                                         "content": symptom_response
                                     })
                                     
-                                    st.session_state.symptom_conversation_history.append(f"User: {user_input}")
-                                    st.session_state.symptom_conversation_history.append(f"Agent: {symptom_response}")
-                                    st.session_state.symptom_questions_count += 1
-                                    
-                                    symptoms_complete = (
-                                        "all symptoms" in symptom_response.lower() or
-                                        "ready to troubleshoot" in symptom_response.lower() or
-                                        "enough information" in symptom_response.lower() or
-                                        "i have all the information" in symptom_response.lower() or
-                                        "let me now" in symptom_response.lower() or
-                                        "now i'll" in symptom_response.lower() or
-                                        "proceeding to" in symptom_response.lower() or
-                                        st.session_state.symptom_questions_count >= 5
-                                    )
-                                    
-                                    if symptoms_complete:
-                                        st.session_state.symptoms_gathered = "\n".join(st.session_state.symptom_conversation_history)
-                                        st.session_state.current_stage = "symptoms_gathered"
-                                    
                                     st.rerun()
                                     
                                 except Exception as e:
@@ -930,7 +949,18 @@ If you have other devices or encounter similar issues in the future, our profess
                         elif st.session_state.current_stage == "symptoms_gathered" and st.session_state.agents_ready:
                             with st.spinner("🔄 Analyzing solutions..."):
                                 try:
-                                    solving_history = "\n".join(st.session_state.problem_solving_history)
+                                    # "That fixed it" ends the session without another solver run
+                                    if st.session_state.problem_solving_step > 0 and \
+                                            get_classifier().classify(user_input).intent == INTENT_SOLVED:
+                                        st.session_state.messages.append({
+                                            "role": "agent",
+                                            "content": "✅ **Excellent! Your issue is resolved!**\n\nThank you for using Device Support Service."
+                                        })
+                                        st.session_state.awaiting_solution_confirmation = False
+                                        st.session_state.current_stage = "complete"
+                                        st.rerun()
+                                    
+                                    solving_history = st.session_state.solving_memory.render()
                                     
                                     problem_context = f"""
 Device Information: {st.session_state.device_confirmed}
@@ -943,10 +973,28 @@ Previous troubleshooting steps:
 Current step number: {st.session_state.problem_solving_step}
 """
                                     
+                                    # Scope the search to the confirmed device and reported error code
+                                    device_id = identify_device(st.session_state.device_confirmed or "", device_catalog())
+                                    error_code = extract_slots(st.session_state.symptoms_gathered or "").error_code
+                                    
+                                    # Search with the running query instead of embedding the whole context
+                                    solutions = None
+                                    if st.session_state.retrieval_state:
+                                        try:
+                                            solutions = st.session_state.retrieval_state.search(
+                                                device_id, error_code, latest_message=user_input
+                                            )
+                                        except Exception as e:
+                                            print(f"RAG search failed: {e}")
+                                            solutions = []
+                                    
                                     solver_task = create_problem_solver_task(
                                         st.session_state.problem_solver_agent,
                                         problem_context,
-                                        rag_service=st.session_state.rag_service
+                                        rag_service=st.session_state.rag_service,
+                                        device_type=device_id,
+                                        error_code=error_code,
+                                        solutions=solutions
                                     )
                                     
                                     solver_crew = Crew(
@@ -971,9 +1019,10 @@ Current step number: {st.session_state.problem_solving_step}
                                         "content": solver_response
                                     })
                                     
-                                    st.session_state.problem_solving_history.append(f"User: {user_input}")
-                                    st.session_state.problem_solving_history.append(f"Agent: {solver_response}")
+                                    st.session_state.solving_memory.add_turn(user_input, solver_response)
                                     st.session_state.problem_solving_step += 1
+                                    if st.session_state.retrieval_state:
+                                        st.session_state.retrieval_state.add_turn(user_input)
                                     
                                     st.session_state.awaiting_solution_confirmation = True
                                     
@@ -0,0 +1,134 @@
+"""
+Benchmark of API response encoding
+Compares standard-library json with orjson serialization, and the bytes on the
+wire for identity, gzip and deflate responses of representative payloads
+(a troubleshooting answer and a batch of knowledge base search results).
+
+Usage:
+    python benchmark_responses.py --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from api_responses import CompressionMiddleware, FastJSONResponse, dumps
+from loadtest import build_rag_service
+
+
+def troubleshooting_answer() -> dict:
+    """A multi-kilobyte /process-issue response"""
+    steps = "\n".join(
+        f"{i}. Check the {part} of your EH222 ice maker. If it is dirty or blocked, clean it "
+        f"with warm water and a soft brush, let it dry completely and restart the machine. "
+        f"Wait ten minutes for the first ice cycle and tell me whether the problem persists."
+        for i, part in enumerate(
+            ["water filter", "inlet valve", "water reservoir", "ice tray", "drain tube",
+             "condenser fins", "fan", "temperature sensor", "power cord", "control panel"],
+            start=1,
+        )
+    )
+    return {"response": f"Let's troubleshoot this step by step.\n\n{steps}", "success": True}
+
+
+def search_results(queries: int = 8) -> dict:
+    """A batch of knowledge base search results from the in-memory sample collection"""
+    service = build_rag_service()
+    problems = ["not making ice", "leaking water", "making noise", "ice cubes too small",
+                "display shows error", "will not turn on", "ice tastes bad", "compressor runs constantly"]
+    results = [
+        {"query": problem, "results": service.search_solutions("EH222", problem, limit=5)}
+        for problem in problems[:queries]
+    ]
+    return {"success": True, "results": results}
+
+
+def time_serializer(fn, payload, iterations: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(payload)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def build_app(payloads: dict, compress: bool, fast_json: bool) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse if fast_json else JSONResponse)
+    if compress:
+        app.add_middleware(CompressionMiddleware, minimum_size=1024, compresslevel=6)
+
+    @app.get("/payload/{name}")
+    async def payload(name: str):
+        return payloads[name]
+
+    return app
+
+
+async def wire_bytes(payloads: dict) -> dict:
+    """Response body bytes per payload and Accept-Encoding"""
+    report = {}
+    baseline = build_app(payloads, compress=False, fast_json=False)
+    optimized = build_app(payloads, compress=True, fast_json=True)
+    for name in payloads:
+        sizes = {}
+        for label, app, accept in (
+            ("stdlib_identity", baseline, "identity"),
+            ("orjson_identity", optimized, "identity"),
+            ("orjson_gzip", optimized, "gzip"),
+            ("orjson_deflate", optimized, "deflate"),
+        ):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                response = await client.get(f"/payload/{name}", headers={"Accept-Encoding": accept})
+                response.raise_for_status()
+                sizes[label] = {
+                    "bytes": response.num_bytes_downloaded,
+                    "content_encoding": response.headers.get("content-encoding", "identity"),
+                }
+        base = sizes["stdlib_identity"]["bytes"]
+        for entry in sizes.values():
+            entry["ratio"] = round(entry["bytes"] / base, 3) if base else 1.0
+        report[name] = sizes
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API response serialization and compression")
+    parser.add_argument("--iterations", type=int, default=2000, help="Serializations per measurement")
+    parser.add_argument("--output", help="Write the JSON report to this file as well")
+    args = parser.parse_args()
+
+    payloads = {"troubleshooting_answer": troubleshooting_answer(), "search_results": search_results()}
+
+    def stdlib(payload):
+        return json.dumps(payload).encode("utf-8")
+
+    serialization = {}
+    for name, payload in payloads.items():
+        stdlib_us = time_serializer(stdlib, payload, args.iterations)
+        fast_us = time_serializer(dumps, payload, args.iterations)
+        serialization[name] = {
+            "stdlib_us": round(stdlib_us, 2),
+            "orjson_us": round(fast_us, 2),
+            "speedup": round(stdlib_us / fast_us, 2) if fast_us else None,
+        }
+
+    report = {
+        "iterations": args.iterations,
+        "serialization": serialization,
+        "transfer": asyncio.run(wire_bytes(payloads)),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Cooperative cancellation of crew runs
+A CancelToken is bound to a crew; the crew checks it between tasks and before
+every LLM call, so abandoned or overdue work stops at the next checkpoint
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from metrics import registry
+
+CANCELLATIONS = registry.counter(
+    "crewai_cancellations_total", "Crew runs stopped before completion, by reason", ["reason"]
+)
+
+REASON_DISCONNECTED = "client_disconnected"
+REASON_DEADLINE = "deadline_exceeded"
+REASON_CLIENT_REQUEST = "client_request"
+REASON_DISCARDED = "result_discarded"
+
+
+class OperationCancelled(Exception):
+    """Raised at a checkpoint when the running operation was cancelled"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Operation cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """Cancellation flag with an optional deadline, shared between the API and a worker thread"""
+
+    def __init__(self, timeout_seconds: Optional[float] = None):
+        """
+        Args:
+            timeout_seconds: Cancel automatically this many seconds from now
+        """
+        self.deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+        self._event = threading.Event()
+        self._reason: Optional[str] = None
+        self._counted = False
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = REASON_DISCONNECTED):
+        """Request cancellation (idempotent - the first reason wins)"""
+        with self._lock:
+            if self._reason is None:
+                self._reason = reason
+            self._event.set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.expired:
+            self.cancel(REASON_DEADLINE)
+        return self._event.is_set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        return self._reason
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, or None without a deadline"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def raise_if_cancelled(self):
+        """Checkpoint: raise OperationCancelled if cancellation was requested"""
+        if self.cancelled:
+            with self._lock:
+                first = not self._counted
+                self._counted = True
+            if first:
+                CANCELLATIONS.inc(reason=self._reason)
+            raise OperationCancelled(self._reason)
+
+
+# Tokens of running crews, keyed by crew id (hooks may run on other threads)
+_crew_tokens: Dict[str, CancelToken] = {}
+_crew_tokens_lock = threading.Lock()
+_hook_installed = False
+
+
+def install_cancellation_hook():
+    """
+    Register a global before-LLM-call hook that blocks calls of cancelled crews.
+    Must run before agents are created; safe to call more than once.
+    """
+    global _hook_installed
+    if _hook_installed:
+        return
+
+    from crewai.hooks import register_before_llm_call_hook
+
+    def _block_cancelled(context):
+        crew = getattr(context, "crew", None)
+        if crew is None:
+            return None
+        with _crew_tokens_lock:
+            token = _crew_tokens.get(str(crew.id))
+        if token is not None and token.cancelled:
+            return False
+        return None
+
+    register_before_llm_call_hook(_block_cancelled)
+    _hook_installed = True
+
+
+def task_checkpoint(token: Optional[CancelToken], callback=None):
+    """
+    Build a crew task_callback that stops the crew between tasks once cancelled
+
+    Args:
+        token: Token to check (None disables the check)
+        callback: Optional task callback to run first
+    """
+    if token is None:
+        return callback
+
+    def check(output):
+        if callback:
+            callback(output)
+        token.raise_if_cancelled()
+
+    return check
+
+
+@contextmanager
+def bind_crew(crew, token: Optional[CancelToken]):
+    """
+    Make a crew's LLM calls honour a token while the block runs.
+    A run stopped by the token surfaces as OperationCancelled.
+    """
+    if token is None:
+        yield
+        return
+
+    key = str(crew.id)
+    with _crew_tokens_lock:
+        _crew_tokens[key] = token
+    try:
+        yield
+    except OperationCancelled:
+        raise
+    except Exception:
+        # A blocked LLM call surfaces as a generic error from the crew
+        token.raise_if_cancelled()
+        raise
+    finally:
+        with _crew_tokens_lock:
+            _crew_tokens.pop(key, None)
@@ -0,0 +1,261 @@
+"""
+LLM record/replay for deterministic tests and benchmarks
+In record mode the agent LLMs call the provider as usual and every prompt and
+response is appended to a local cassette file (JSON lines, keyed by prompt hash).
+In replay mode the responses are served back from the cassette without a
+provider or API key, optionally with synthetic latency.
+
+    LLM_CASSETTE_MODE=record LLM_CASSETTE_PATH=flows.jsonl python main.py
+    LLM_CASSETTE_MODE=replay LLM_CASSETTE_PATH=flows.jsonl python main.py
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM
+
+from config import config
+from metrics import registry
+
+CASSETTE_CALLS = registry.counter(
+    "crewai_llm_cassette_total", "LLM calls recorded to or replayed from a cassette (recorded, replayed, miss)", ["result"]
+)
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode for a prompt the cassette has no response for"""
+
+    def __init__(self, key: str):
+        super().__init__(f"No recorded LLM response for prompt {key[:12]} (record the flow again)")
+        self.key = key
+
+
+def _normalize(messages) -> List[dict]:
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    return [{"role": m.get("role"), "content": str(m.get("content", ""))} for m in messages]
+
+
+def prompt_key(messages) -> str:
+    """Hash of the prompt messages (role and content)"""
+    payload = json.dumps(_normalize(messages), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded responses per prompt; a prompt recorded several times replays its responses in order"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, List[dict]] = {}
+        self._replayed: Counter = Counter()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+
+    def record(self, messages, response: str, model: str = None, usage: dict = None, elapsed: float = None):
+        """Append a prompt and its response to the cassette file"""
+        entry = {
+            "key": prompt_key(messages),
+            "model": model,
+            "messages": _normalize(messages),
+            "response": response,
+            "usage": usage or {},
+            "elapsed": elapsed,
+        }
+        with self._lock:
+            self._entries.setdefault(entry["key"], []).append(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        CASSETTE_CALLS.inc(result="recorded")
+
+    def replay(self, messages) -> dict:
+        """
+        Recorded entry for a prompt
+
+        Raises:
+            CassetteMiss: If the prompt was never recorded
+        """
+        key = prompt_key(messages)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                CASSETTE_CALLS.inc(result="miss")
+                raise CassetteMiss(key)
+            # Repeated prompts get their responses in recorded order, then the last one again
+            entry = entries[min(self._replayed[key], len(entries) - 1)]
+            self._replayed[key] += 1
+        CASSETTE_CALLS.inc(result="replayed")
+        return entry
+
+    def rewind(self):
+        """Replay every prompt from its first recorded response again"""
+        with self._lock:
+            self._replayed.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str = None) -> Cassette:
+    """Cassette for a path (default LLM_CASSETTE_PATH), shared by all LLMs of the process"""
+    path = os.path.abspath(path or config.cassette.path)
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+class RecordingLLM(BaseLLM):
+    """Wraps a provider LLM and records each text response to a cassette"""
+
+    def __init__(self, llm, cassette: Cassette):
+        super().__init__(model=llm.model, temperature=getattr(llm, "temperature", None))
+        self.llm = llm
+        self.cassette = cassette
+        self.stream = getattr(llm, "stream", False)
+        self.stop = list(getattr(llm, "stop", None) or [])
+
+    def _usage(self) -> dict:
+        return dict(getattr(self.llm, "_token_usage", None) or {})
+
+    def _record(self, messages, response, before: dict, started: float):
+        # Tool call results of native function calling are not text and cannot be replayed
+        if not isinstance(response, str):
+            return
+        after = self._usage()
+        usage = {name: after.get(name, 0) - before.get(name, 0)
+                 for name in ("prompt_tokens", "completion_tokens", "cached_prompt_tokens")}
+        self.cassette.record(messages, response, self.model, usage, time.perf_counter() - started)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        # The agent sets its stop words on this object; the provider LLM has to see them
+        self.llm.stop = list(self.stop or [])
+        before, started = self._usage(), time.perf_counter()
+        response = self.llm.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                                 from_task=from_task, from_agent=from_agent, response_model=response_model)
+        self._record(messages, response, before, started)
+        return response
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        self.llm.stop = list(self.stop or [])
+        before, started = self._usage(), time.perf_counter()
+        response = await self.llm.acall(messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                                        from_task=from_task, from_agent=from_agent, response_model=response_model)
+        self._record(messages, response, before, started)
+        return response
+
+    def supports_stop_words(self) -> bool:
+        return self.llm.supports_stop_words()
+
+    def supports_function_calling(self) -> bool:
+        return self.llm.supports_function_calling()
+
+    def get_context_window_size(self) -> int:
+        return self.llm.get_context_window_size()
+
+    def get_token_usage_summary(self):
+        return self.llm.get_token_usage_summary()
+
+
+class ReplayLLM(BaseLLM):
+    """Serves recorded responses from a cassette, with optional synthetic latency"""
+
+    def __init__(self, cassette: Cassette, model: str = "replay", latency: float = 0.0, tokens_per_second: float = 0.0):
+        """
+        Initialize the LLM
+
+        Args:
+            cassette: Cassette to replay
+            model: Model name reported in events and metrics
+            latency: Seconds added to every call
+            tokens_per_second: Simulated output rate (0 adds no per-token delay)
+        """
+        super().__init__(model=model, temperature=0.0)
+        self.cassette = cassette
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+
+    def _start(self, messages, from_task, from_agent) -> dict:
+        """Look up the response and track its recorded token usage; returns the entry"""
+        self._emit_call_started_event(messages=messages, from_task=from_task, from_agent=from_agent)
+        try:
+            entry = self.cassette.replay(messages)
+        except CassetteMiss as e:
+            self._emit_call_failed_event(error=str(e), from_task=from_task, from_agent=from_agent)
+            raise
+        usage = dict(entry.get("usage") or {})
+        if not usage.get("completion_tokens"):
+            usage["completion_tokens"] = len(entry["response"].split())
+        self._track_token_usage_internal(usage)
+        return entry
+
+    def _delay(self, entry: dict) -> float:
+        delay = self.latency
+        if self.tokens_per_second > 0:
+            delay += ((entry.get("usage") or {}).get("completion_tokens") or len(entry["response"].split())) / self.tokens_per_second
+        return delay
+
+    def _finish(self, entry: dict, messages, from_task, from_agent) -> str:
+        self._emit_call_completed_event(
+            response=entry["response"],
+            call_type=LLMCallType.LLM_CALL,
+            from_task=from_task,
+            from_agent=from_agent,
+            messages=messages,
+        )
+        return entry["response"]
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        entry = self._start(messages, from_task, from_agent)
+        time.sleep(self._delay(entry))
+        return self._finish(entry, messages, from_task, from_agent)
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        entry = self._start(messages, from_task, from_agent)
+        await asyncio.sleep(self._delay(entry))
+        return self._finish(entry, messages, from_task, from_agent)
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+
+def cassette_llm(model: str, build) -> Optional[BaseLLM]:
+    """
+    LLM for the configured cassette mode (see CassetteConfig)
+
+    Args:
+        model: Model name of the agent
+        build: Function () -> provider LLM, only called when the provider is needed
+
+    Returns:
+        A ReplayLLM, a RecordingLLM around build(), or None when no cassette is configured
+    """
+    settings = config.cassette
+    if settings.mode == MODE_REPLAY:
+        return ReplayLLM(get_cassette(settings.path), model, settings.latency, settings.tokens_per_second)
+    if settings.mode == MODE_RECORD:
+        return RecordingLLM(build(), get_cassette(settings.path))
+    return None
@@ -9,9 +9,10 @@ load_dotenv()
 
 from crewai import Crew
 from agents import create_device_agent, create_problem_solver_agent, create_rag_query_tool
-from tasks import create_device_identification_task, create_problem_narrowing_task, create_solution_recommendation_task
+from tasks import create_device_identification_task, create_problem_narrowing_task
 from rag_service import RAGService
 from config import config
+from memory import create_memory
 
 
 def run_chat():
@@ -73,8 +74,8 @@ def run_chat():
     print("  • Type 'quit' or 'exit' to end the conversation")
     print("  • Type 'clear' to start fresh\n")
     
-    # Maintain conversation context
-    conversation_history = []
+    # Maintain conversation context: recent turns verbatim, older ones summarized
+    memory = create_memory("conversation")
     
     while True:
         try:
@@ -88,7 +89,7 @@ def run_chat():
             
             # Handle clear command
             if user_input.lower() in ['clear', 'reset']:
-                conversation_history = []
+                memory.clear()
                 print("\n🔄 Conversation cleared. Starting fresh.\n")
                 continue
             
@@ -97,13 +98,14 @@ def run_chat():
                 print("Please describe your device issue.\n")
                 continue
             
-            # Add to conversation history
-            conversation_history.append(f"User: {user_input}")
-            
-            # Build context from recent messages
-            recent_context = "\n".join(conversation_history[-4:])  # Last 4 messages
+            # Build context from previous turns plus the current message
+            recent_context = "\n\n".join(
+                part for part in (memory.render(), f"User: {user_input}") if part
+            )
             
             print("\n⏳ Processing your request...\n")
+            if rag_service:
+                rag_tool.new_turn()
             
             # Create dynamic tasks with conversation context
             device_task = create_device_identification_task(device_agent)
@@ -129,7 +131,7 @@ def run_chat():
                 print(f"\n{result}\n")
                 
                 # Add to history
-                conversation_history.append(f"Assistant: {result}")
+                memory.add_turn(user_input, str(result))
                 
             except Exception as crew_error:
                 print(f"\n⚠ Agent processing error: {str(crew_error)[:100]}...")
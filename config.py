@@ -2,8 +2,8 @@
 Advanced configuration and utilities for the device support service
 """
 import os
-from typing import Optional
-from dataclasses import dataclass
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -21,6 +21,130 @@ class AgentConfig:
     temperature: float = 0.3
     max_iterations: int = 10
     verbose: bool = True
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None
+    stop: List[str] = field(default_factory=list)  # stop sequences
+    max_execution_time: Optional[int] = None  # seconds per task
+
+
+# Agents with their own model settings, and the env var prefix of each
+AGENT_NAMES = {
+    "device": "DEVICE_AGENT",
+    "symptom": "SYMPTOM_AGENT",
+    "problem_solver": "PROBLEM_SOLVER_AGENT",
+}
+
+# Generation limits per agent, used unless the agent's own env vars or the global
+# ones (GLOBAL_LIMIT_ENV) set them. The device and symptom agents answer with one short
+# question or summary; the stop sequences end a reply that goes on to write the user's next turn.
+AGENT_LIMITS = {
+    "device": {"max_tokens": 300, "max_iterations": 3, "max_execution_time": 60, "stop": ["\nUser:", "\nCustomer:"]},
+    "symptom": {"max_tokens": 400, "max_iterations": 3, "max_execution_time": 60, "stop": ["\nUser:", "\nCustomer:"]},
+    "problem_solver": {"max_iterations": 6, "max_execution_time": 120},
+}
+
+# Global env var of each limit; when set, it applies to every agent without its own setting
+GLOBAL_LIMIT_ENV = {
+    "max_iterations": "AGENT_MAX_ITER",
+    "max_tokens": "AGENT_MAX_TOKENS",
+    "max_execution_time": "AGENT_MAX_EXECUTION_TIME",
+    "stop": "AGENT_STOP",
+}
+
+
+def _optional_env(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "") else None
+
+
+def _stop_env(name: str) -> Optional[List[str]]:
+    """Stop sequences from an env var, separated by "|" ("\\n" is a newline); None if unset"""
+    value = os.getenv(name)
+    if value is None:
+        return None
+    return [part.replace("\\n", "\n") for part in value.split("|") if part]
+
+
+@dataclass
+class SemanticCacheConfig:
+    """Configuration for the semantic response cache"""
+    enabled: bool = True
+    similarity_threshold: float = 0.92
+    max_entries: int = 500
+    ttl_seconds: float = 86400
+
+
+@dataclass
+class DeviceMatchConfig:
+    """Configuration for local device identification (see device_matcher.py)"""
+    enabled: bool = True
+    min_confidence: float = 0.7  # below this, or when ambiguous, the device agent asks
+
+
+@dataclass
+class SymptomSlotsConfig:
+    """Configuration for symptom slot extraction (see slot_extractor.py)"""
+    llm_extraction: bool = False  # one LLM call on the first detailed message fills what the regexes missed
+    llm_min_words: int = 8
+
+
+@dataclass
+class IntentConfig:
+    """Configuration for the local reply intent classifier (see intent.py)"""
+    enabled: bool = True
+    min_confidence: float = 0.6
+    model_path: Optional[str] = None  # naive Bayes model trained with "python intent.py train"
+    log_path: Optional[str] = None  # JSON lines log of classified replies, the training data
+
+
+@dataclass
+class SpeculationConfig:
+    """Configuration for speculative next troubleshooting steps (see speculation.py)"""
+    enabled: bool = False
+    max_per_session: int = 3  # speculative solver runs a session may start
+    max_workers: int = 4  # background threads shared by all sessions
+    plain_failure_max_words: int = 8  # longer failure reports carry new details and run the solver fresh
+
+
+@dataclass
+class RAGPrefetchConfig:
+    """Configuration for background knowledge base retrieval (see rag_prefetch.py)"""
+    enabled: bool = True
+    max_workers: int = 4  # background threads shared by all sessions
+
+
+@dataclass
+class RetrievalStateConfig:
+    """Configuration for the running knowledge base query of a session (see retrieval_state.py)"""
+    enabled: bool = True
+    decay: float = 0.6  # weight older turns keep each time a new turn is added
+    max_terms: int = 12
+    term_boost: float = 0.1  # score added to a result containing all key terms
+
+
+@dataclass
+class KBToolConfig:
+    """Configuration for the knowledge base tool of the problem solver (see kb_tool.py)"""
+    enabled: bool = True
+    max_calls_per_turn: int = 2  # searches per turn; repeated searches are answered from the memo
+
+
+@dataclass
+class CassetteConfig:
+    """Configuration for LLM record/replay (see cassette.py)"""
+    mode: Optional[str] = None  # "record", "replay" or None for the provider
+    path: str = "llm_cassette.jsonl"
+    latency: float = 0.0  # replay: seconds added to every call
+    tokens_per_second: float = 0.0  # replay: simulated output rate, 0 for none
+
+
+@dataclass
+class MemoryConfig:
+    """Configuration for the rolling conversation memory"""
+    window_turns: int = 4
+    default_max_tokens: int = 1500
+    stage_max_tokens: dict = field(default_factory=lambda: {"symptoms": 1200, "solving": 2000})
+    summarizer: str = "extractive"  # "extractive" (no LLM call) or "llm"
 
 
 class Config:
@@ -36,13 +160,119 @@ class Config:
             model=os.getenv("MODEL", "gpt-4"),
             temperature=float(os.getenv("AGENT_TEMPERATURE", "0.3")),
             verbose=os.getenv("CREWAI_VERBOSE", "true").lower() == "true",
+            max_tokens=_optional_env("AGENT_MAX_TOKENS", int),
+            timeout=_optional_env("AGENT_TIMEOUT", float),
+            max_iterations=int(os.getenv("AGENT_MAX_ITER", "10")),
+            max_execution_time=_optional_env("AGENT_MAX_EXECUTION_TIME", int),
+            stop=_stop_env("AGENT_STOP") or [],
+        )
+        
+        # Per-agent overrides, e.g. DEVICE_AGENT_MODEL=gpt-4o-mini (unset limits use the global
+        # env var if set, then AGENT_LIMITS, then the defaults above)
+        self.agent_overrides: Dict[str, AgentConfig] = {
+            name: self._agent_config_from_env(prefix, self.agents, AGENT_LIMITS.get(name, {}))
+            for name, prefix in AGENT_NAMES.items()
+        }
+        
+        self.semantic_cache = SemanticCacheConfig(
+            enabled=os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true",
+            similarity_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500")),
+            ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400")),
+        )
+        
+        self.memory = MemoryConfig(
+            window_turns=int(os.getenv("MEMORY_WINDOW_TURNS", "4")),
+            stage_max_tokens={
+                "symptoms": int(os.getenv("MEMORY_MAX_TOKENS_SYMPTOMS", "1200")),
+                "solving": int(os.getenv("MEMORY_MAX_TOKENS_SOLVING", "2000")),
+            },
+            summarizer=os.getenv("MEMORY_SUMMARIZER", "extractive").lower(),
+        )
+        
+        self.device_match = DeviceMatchConfig(
+            enabled=os.getenv("DEVICE_FAST_PATH", "true").lower() == "true",
+            min_confidence=float(os.getenv("DEVICE_MATCH_MIN_CONFIDENCE", "0.7")),
+        )
+        
+        self.symptom_slots = SymptomSlotsConfig(
+            llm_extraction=os.getenv("SLOT_EXTRACTION_LLM", "false").lower() == "true",
+            llm_min_words=int(os.getenv("SLOT_EXTRACTION_LLM_MIN_WORDS", "8")),
+        )
+        
+        self.intent = IntentConfig(
+            enabled=os.getenv("INTENT_CLASSIFIER", "true").lower() == "true",
+            min_confidence=float(os.getenv("INTENT_MIN_CONFIDENCE", "0.6")),
+            model_path=os.getenv("INTENT_MODEL_PATH") or None,
+            log_path=os.getenv("INTENT_LOG_PATH") or None,
+        )
+        
+        self.speculation = SpeculationConfig(
+            enabled=os.getenv("SPECULATION_ENABLED", "false").lower() == "true",
+            max_per_session=int(os.getenv("SPECULATION_MAX_PER_SESSION", "3")),
+            max_workers=int(os.getenv("SPECULATION_WORKERS", "4")),
+        )
+        
+        self.rag_prefetch = RAGPrefetchConfig(
+            enabled=os.getenv("RAG_PREFETCH_ENABLED", "true").lower() == "true",
+            max_workers=int(os.getenv("RAG_PREFETCH_WORKERS", "4")),
+        )
+        
+        self.retrieval_state = RetrievalStateConfig(
+            enabled=os.getenv("RETRIEVAL_STATE_ENABLED", "true").lower() == "true",
+            decay=float(os.getenv("RETRIEVAL_DECAY", "0.6")),
+        )
+        
+        self.kb_tool = KBToolConfig(
+            enabled=os.getenv("KB_TOOL_ENABLED", "true").lower() == "true",
+            max_calls_per_turn=int(os.getenv("KB_TOOL_MAX_CALLS", "2")),
+        )
+        
+        self.cassette = CassetteConfig(
+            mode=(os.getenv("LLM_CASSETTE_MODE") or "").lower() or None,
+            path=os.getenv("LLM_CASSETTE_PATH", "llm_cassette.jsonl"),
+            latency=float(os.getenv("LLM_CASSETTE_LATENCY", "0")),
+            tokens_per_second=float(os.getenv("LLM_CASSETTE_TOKENS_PER_SECOND", "0")),
         )
         
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
     
+    @staticmethod
+    def _agent_config_from_env(prefix: str, defaults: AgentConfig, limits: dict = None) -> AgentConfig:
+        limits = limits or {}
+        
+        def limit(name: str, env_value):
+            if env_value is not None:
+                return env_value
+            if os.getenv(GLOBAL_LIMIT_ENV[name], "") != "":
+                return getattr(defaults, name)
+            return limits.get(name, getattr(defaults, name))
+        
+        temperature = _optional_env(f"{prefix}_TEMPERATURE", float)
+        timeout = _optional_env(f"{prefix}_TIMEOUT", float)
+        return AgentConfig(
+            model=os.getenv(f"{prefix}_MODEL") or defaults.model,
+            temperature=defaults.temperature if temperature is None else temperature,
+            max_iterations=limit("max_iterations", _optional_env(f"{prefix}_MAX_ITER", int)),
+            verbose=defaults.verbose,
+            max_tokens=limit("max_tokens", _optional_env(f"{prefix}_MAX_TOKENS", int)),
+            timeout=defaults.timeout if timeout is None else timeout,
+            stop=list(limit("stop", _stop_env(f"{prefix}_STOP"))),
+            max_execution_time=limit("max_execution_time", _optional_env(f"{prefix}_MAX_EXECUTION_TIME", int)),
+        )
+    
+    def agent_config(self, name: Optional[str] = None) -> AgentConfig:
+        """
+        Model settings of an agent
+        
+        Args:
+            name: "device", "symptom" or "problem_solver"; None or unknown names get the defaults
+        """
+        return self.agent_overrides.get(name, self.agents)
+    
     def validate(self) -> tuple[bool, Optional[str]]:
         """Validate configuration"""
-        if not self.openai_api_key:
+        if not self.openai_api_key and self.cassette.mode != "replay":
             return False, "OPENAI_API_KEY not set"
         return True, None
 
@@ -2,15 +2,50 @@
 FastAPI service for CrewAI backend
 Handles device support requests asynchronously
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
+from typing import Optional
 from dotenv import load_dotenv
 import os
+import json
+import time
+import hashlib
 import logging
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from metrics import (
+    registry as metrics_registry,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    STAGE_LATENCY,
+    ERROR_COUNT,
+    EXECUTOR_QUEUED,
+    EXECUTOR_ACTIVE,
+    ASYNC_CREWS_ACTIVE,
+    API_READY,
+    WEBSOCKET_CONNECTIONS,
+    install_crewai_listeners,
+    record_agent_token_usage,
+)
+from jobs import JobStore, JobStoreFullError, validate_webhook_url, send_webhook
+from config import config
+from singleflight import AsyncSingleFlight
+from api_responses import CompressionMiddleware, FastJSONResponse
+from cancellation import (
+    CancelToken,
+    OperationCancelled,
+    REASON_CLIENT_REQUEST,
+    REASON_DEADLINE,
+    REASON_DISCONNECTED,
+    bind_crew,
+    install_cancellation_hook,
+    task_checkpoint,
+)
+
 # Load environment
 load_dotenv()
 
@@ -18,7 +53,7 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Device Support CrewAI API")
+app = FastAPI(title="Device Support CrewAI API", default_response_class=FastJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -29,13 +64,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (troubleshooting answers, search results) for clients that accept it
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024")),
+    compresslevel=int(os.getenv("RESPONSE_COMPRESSION_LEVEL", "6")),
+)
+
+# Shared worker pool for crew runs (queue depth is exported on /metrics)
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CREWAI_API_WORKERS", "4")),
+    thread_name_prefix="crew-worker",
+)
+
+
+# "async" runs crews with CrewAI's native async kickoff on the event loop, so waiting on
+# the LLM does not hold a thread; "thread" runs the synchronous kickoff on the worker pool
+CREW_EXECUTION_MODE = os.getenv("CREW_EXECUTION_MODE", "async").lower()
+
+
+async def run_in_executor(func, *args):
+    """Run a blocking function on the shared worker pool, tracking queue depth"""
+    started = False
+
+    def tracked():
+        nonlocal started
+        started = True
+        EXECUTOR_QUEUED.dec()
+        EXECUTOR_ACTIVE.inc()
+        try:
+            return func(*args)
+        finally:
+            EXECUTOR_ACTIVE.dec()
+
+    EXECUTOR_QUEUED.inc()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, tracked)
+    finally:
+        if not started:
+            # Never picked up by a worker (rejected or cancelled while queued)
+            EXECUTOR_QUEUED.dec()
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and observe latency per endpoint"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", None) or "unmatched"
+        REQUEST_COUNT.inc(endpoint=endpoint, method=request.method, status=str(status))
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+
+# Results of asynchronous jobs are kept for JOB_TTL_SECONDS after completion
+job_store = JobStore(
+    ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", "3600")),
+    max_jobs=int(os.getenv("JOB_MAX_JOBS", "1000")),
+)
+# Keep references to running job tasks so they are not garbage collected
+_job_tasks = set()
+
+# Identical concurrent /process-issue requests share one crew run
+process_issue_flight = AsyncSingleFlight("process_issue")
+
 # Initialize RAG Service globally
 logger.info("Initializing RAG Service...")
 rag_service = None
 
+# Semantic cache of first-turn responses (needs the RAG service for embeddings)
+response_cache = None
+# Cache stage for responses produced by the full three-agent crew
+CACHE_STAGE_PROCESS_ISSUE = "process_issue"
+
 def init_rag_service():
     """Initialize RAG service"""
-    global rag_service
+    global rag_service, response_cache
     try:
         from rag_service import RAGService
         
@@ -52,119 +161,719 @@ def init_rag_service():
             api_key=qdrant_api_key
         )
         logger.info("✓ RAG Service initialized successfully")
+        
+        if config.semantic_cache.enabled:
+            from semantic_cache import SemanticCache
+            from agents import device_catalog
+            response_cache = SemanticCache(
+                embed_fn=rag_service.embed,
+                threshold=config.semantic_cache.similarity_threshold,
+                max_entries=config.semantic_cache.max_entries,
+                ttl_seconds=config.semantic_cache.ttl_seconds,
+                devices=device_catalog(),
+            )
+            logger.info("✓ Semantic response cache enabled")
     except Exception as e:
         logger.error(f"Failed to initialize RAG Service: {e}")
         rag_service = None
 
-# Initialize RAG on startup
-@app.on_event("startup")
-def startup():
-    """Initialize RAG service on app startup"""
-    global rag_service
-    logger.info("App startup - initializing RAG service")
+# Readiness is only reported once warm-up has paid the cold-start costs
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+warmup_status = {"ready": False, "steps": {}, "error": None}
+_warmup_task = None
+
+def _prime_llm_connection(llm):
+    """
+    Open a connection to the LLM provider with a cheap request; the client is
+    pooled, so the kept-alive connection serves every agent of the same model
+    """
+    client = getattr(llm, "client", None)
+    if client is None or not hasattr(client, "models"):
+        return
+    client.models.retrieve(llm.model)
+
+def warm_up():
+    """
+    Pay cold-start costs before serving traffic: import the crew modules,
+    initialize RAG, build agents and tasks, open the LLM connection and
+    run a dummy knowledge base search
+    """
+    steps = warmup_status["steps"]
+    
+    with STAGE_LATENCY.time(stage="warmup_imports"):
+        import crewai  # noqa: F401
+        import agents
+        import tasks
+    steps["imports"] = "ok"
+    
+    with STAGE_LATENCY.time(stage="warmup_rag_init"):
+        if not rag_service:
+            init_rag_service()
+    if not rag_service:
+        raise RuntimeError("RAG Service not initialized")
+    steps["rag_service"] = "ok"
+    
+    with STAGE_LATENCY.time(stage="warmup_agents"):
+        device_agent = agents.create_device_agent()
+        symptom_agent = agents.create_symptom_agent()
+        problem_solver_agent = agents.create_problem_solver_agent()
+        tasks.create_device_identification_task(device_agent)
+        tasks.create_symptom_gathering_task(symptom_agent, "warm-up")
+        tasks.create_problem_solver_task(problem_solver_agent, "warm-up")
+    steps["agents"] = "ok"
+    
+    # Best effort - a provider hiccup should not keep the API out of rotation
     try:
-        init_rag_service()
+        with STAGE_LATENCY.time(stage="warmup_llm_connection"):
+            # Agents may be routed to different models; prime each distinct client once
+            primed = set()
+            for agent in (device_agent, symptom_agent, problem_solver_agent):
+                client = getattr(agent.llm, "client", None)
+                if id(client) not in primed:
+                    primed.add(id(client))
+                    _prime_llm_connection(agent.llm)
+        steps["llm_connection"] = "ok"
     except Exception as e:
-        logger.error(f"Failed during startup: {e}")
+        steps["llm_connection"] = f"skipped: {e}"
+        logger.warning(f"Warm-up could not prime the LLM connection: {e}")
+    
+    with STAGE_LATENCY.time(stage="warmup_rag_search"):
+        rag_service.search_solutions("EH222", "warm-up query", limit=1)
+    steps["rag_search"] = "ok"
+
+async def warm_up_until_ready():
+    """Run warm-up in the background, retrying until it succeeds"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, warm_up)
+        except Exception as e:
+            warmup_status["error"] = str(e)
+            ERROR_COUNT.inc(where="warmup", type=type(e).__name__)
+            logger.error(f"Warm-up failed, retrying in {WARMUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+            continue
+        warmup_status["ready"] = True
+        warmup_status["error"] = None
+        API_READY.set(1)
+        logger.info("✓ Warm-up complete - API is ready")
+        return
+
+@app.on_event("startup")
+async def startup():
+    """Start warm-up (including RAG initialization) in the background on app startup"""
+    global _warmup_task
+    logger.info("App startup - starting warm-up")
+    install_crewai_listeners()
+    # Before any agent is built, so every crew run honours its cancel token
+    install_cancellation_hook()
+    _warmup_task = asyncio.create_task(warm_up_until_ready())
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop a warm-up that is still retrying"""
+    if _warmup_task and not _warmup_task.done():
+        _warmup_task.cancel()
 
 class DeviceIssueRequest(BaseModel):
     """Request model for device support"""
     user_message: str
     conversation_history: list = []
+    bypass_cache: bool = False
+    deadline_seconds: Optional[float] = None
 
 class DeviceIssueResponse(BaseModel):
     """Response model for device support"""
     response: str
     success: bool
 
+class JobRequest(DeviceIssueRequest):
+    """Request model for an asynchronous device support job"""
+    webhook_url: Optional[str] = None
+
+class JobSubmittedResponse(BaseModel):
+    """Response model returned when a job is accepted"""
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatusResponse(BaseModel):
+    """Response model for job status polling"""
+    job_id: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    partial_output: list = []
+    result: Optional[str] = None
+    error: Optional[str] = None
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness check endpoint"""
     return {"status": "healthy", "service": "CrewAI API"}
 
-def process_issue_sync(user_message: str):
-    """Synchronous function to process device issue (runs in thread pool)"""
-    try:
-        from crewai import Crew
-        from agents import create_device_agent, create_symptom_agent, create_problem_solver_agent
-        from tasks import create_device_identification_task, create_symptom_gathering_task, create_problem_solver_task
-        
-        print(f"\n{'='*80}")
-        print(f"[PROCESSING] Device issue: {user_message[:100]}...")
-        print(f"{'='*80}\n")
-        logger.info(f"Processing device issue: {user_message[:100]}...")
-        
-        # Check RAG service
-        if not rag_service:
-            print("❌ ERROR: RAG Service not initialized!")
-            raise ValueError("RAG Service not initialized. Please check Qdrant connection.")
-        
-        # Create agents
-        print("[1/4] Creating agents...")
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check endpoint - 503 until warm-up has completed"""
+    body = {
+        "ready": warmup_status["ready"],
+        "steps": warmup_status["steps"],
+        "error": warmup_status["error"],
+    }
+    if not warmup_status["ready"]:
+        return FastJSONResponse(status_code=503, content=body)
+    return body
+
+@app.get("/metrics")
+async def metrics():
+    """Metrics endpoint in Prometheus text exposition format"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+def build_issue_crew(user_message: str, on_task_complete=None, cancel_token: CancelToken = None):
+    """
+    Create the agents, tasks (including the knowledge base lookup) and crew for a device issue
+    
+    Args:
+        user_message: The user's message
+        on_task_complete: Optional callback(agent_role, output) invoked after each task
+        cancel_token: Optional token checked between stages and tasks
+    
+    Returns:
+        (crew, agents)
+    """
+    from crewai import Crew
+    from agents import create_device_agent, create_symptom_agent, create_problem_solver_agent
+    from tasks import create_device_identification_task, create_symptom_gathering_task, create_problem_solver_task
+    
+    def checkpoint():
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+    
+    print(f"\n{'='*80}")
+    print(f"[PROCESSING] Device issue: {user_message[:100]}...")
+    print(f"{'='*80}\n")
+    logger.info(f"Processing device issue: {user_message[:100]}...")
+    
+    # Check RAG service
+    if not rag_service:
+        print("❌ ERROR: RAG Service not initialized!")
+        raise ValueError("RAG Service not initialized. Please check Qdrant connection.")
+    
+    # Create agents
+    checkpoint()
+    print("[1/4] Creating agents...")
+    with STAGE_LATENCY.time(stage="create_agents"):
         device_agent = create_device_agent()
         symptom_agent = create_symptom_agent()
         problem_solver_agent = create_problem_solver_agent()
-        print("✓ Agents created\n")
-        
-        # Create tasks
-        print("[2/4] Creating tasks...")
+    print("✓ Agents created\n")
+    
+    # Create tasks (includes the knowledge base lookup for the solver)
+    checkpoint()
+    print("[2/4] Creating tasks...")
+    with STAGE_LATENCY.time(stage="create_tasks"):
         device_task = create_device_identification_task(device_agent)
         symptom_task = create_symptom_gathering_task(symptom_agent, user_message)
         problem_task = create_problem_solver_task(problem_solver_agent, user_message, rag_service)
-        print("✓ Tasks created\n")
-        
-        # Create and run crew
-        print("[3/4] Creating crew...")
+    print("✓ Tasks created\n")
+    
+    # Create crew
+    checkpoint()
+    print("[3/4] Creating crew...")
+    agents = [device_agent, symptom_agent, problem_solver_agent]
+    with STAGE_LATENCY.time(stage="create_crew"):
         crew = Crew(
-            agents=[device_agent, symptom_agent, problem_solver_agent],
+            agents=agents,
             tasks=[device_task, symptom_task, problem_task],
-            verbose=True
+            verbose=True,
+            task_callback=task_checkpoint(
+                cancel_token,
+                (lambda output: on_task_complete(output.agent, output.raw))
+                if on_task_complete else None,
+            ),
         )
-        print("✓ Crew created\n")
+    print("✓ Crew created\n")
+    return crew, agents
+
+def _issue_processed(result) -> str:
+    print(f"\n{'-'*80}")
+    print(f"\n✓ Issue processed successfully")
+    print(f"{'='*80}\n")
+    logger.info("✓ Issue processed successfully")
+    return str(result)
+
+def _issue_cancelled(e: OperationCancelled):
+    print(f"\n⏹ CANCELLED: {e.reason}")
+    print(f"{'='*80}\n")
+    logger.info(f"Processing cancelled: {e.reason}")
+
+def _issue_failed(e: Exception) -> ValueError:
+    ERROR_COUNT.inc(where="process_issue", type=type(e).__name__)
+    print(f"\n❌ ERROR: {str(e)}")
+    print(f"{'='*80}\n")
+    logger.error(f"Error processing issue: {str(e)}")
+    return ValueError(f"Error: {str(e)}")
+
+def process_issue_sync(user_message: str, on_task_complete=None, cancel_token: CancelToken = None):
+    """
+    Synchronous function to process device issue (runs in thread pool)
+    
+    Args:
+        user_message: The user's message
+        on_task_complete: Optional callback(agent_role, output) invoked after each task
+        cancel_token: Optional token checked between stages, tasks and LLM calls
+    
+    Raises:
+        OperationCancelled: If the token was cancelled before the crew finished
+    """
+    try:
+        crew, agents = build_issue_crew(user_message, on_task_complete, cancel_token)
         
         # Execute the crew
         print("[4/4] Executing crew...")
         print(f"{'-'*80}\n")
-        result = crew.kickoff(inputs={"user_input": user_message})
-        print(f"\n{'-'*80}")
+        try:
+            with STAGE_LATENCY.time(stage="kickoff"), bind_crew(crew, cancel_token):
+                result = crew.kickoff(inputs={"user_input": user_message})
+        finally:
+            record_agent_token_usage(agents)
+        return _issue_processed(result)
         
-        print(f"\n✓ Issue processed successfully")
-        print(f"{'='*80}\n")
-        logger.info("✓ Issue processed successfully")
-        return str(result)
+    except OperationCancelled as e:
+        _issue_cancelled(e)
+        raise
+    except Exception as e:
+        raise _issue_failed(e)
+
+async def process_issue_async(user_message: str, on_task_complete=None, cancel_token: CancelToken = None):
+    """
+    Process a device issue with CrewAI's native async kickoff
+    
+    Only building the crew (which includes the blocking knowledge base lookup) uses
+    a worker thread; the LLM calls are awaited on the event loop.
+    
+    Args:
+        user_message: The user's message
+        on_task_complete: Optional callback(agent_role, output) invoked after each task
+        cancel_token: Optional token checked between stages, tasks and LLM calls
+    
+    Raises:
+        OperationCancelled: If the token was cancelled before the crew finished
+    """
+    try:
+        crew, agents = await run_in_executor(build_issue_crew, user_message, on_task_complete, cancel_token)
         
+        print("[4/4] Executing crew (async)...")
+        print(f"{'-'*80}\n")
+        ASYNC_CREWS_ACTIVE.inc()
+        try:
+            with STAGE_LATENCY.time(stage="kickoff"), bind_crew(crew, cancel_token):
+                result = await crew.akickoff(inputs={"user_input": user_message})
+        finally:
+            ASYNC_CREWS_ACTIVE.dec()
+            record_agent_token_usage(agents)
+        return _issue_processed(result)
+        
+    except OperationCancelled as e:
+        _issue_cancelled(e)
+        raise
     except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        print(f"{'='*80}\n")
-        logger.error(f"Error processing issue: {str(e)}")
-        raise ValueError(f"Error: {str(e)}")
+        raise _issue_failed(e)
+
+def _cache_lookup(user_message: str, conversation_history: list = None, bypass_cache: bool = False):
+    """
+    Semantic cache lookup for a device issue
+    
+    Returns:
+        (cacheable, cached response or None)
+    """
+    # Only opening messages are context-free enough to share answers across sessions
+    cacheable = (
+        response_cache is not None
+        and not bypass_cache
+        and len(conversation_history or []) <= 1
+    )
+    
+    if cacheable:
+        try:
+            with STAGE_LATENCY.time(stage="cache_lookup"):
+                cached = response_cache.lookup(user_message, CACHE_STAGE_PROCESS_ISSUE)
+            if cached is not None:
+                logger.info("✓ Served response from semantic cache")
+                return cacheable, cached
+        except Exception as e:
+            ERROR_COUNT.inc(where="semantic_cache", type=type(e).__name__)
+            logger.warning(f"Semantic cache lookup failed: {e}")
+    return cacheable, None
+
+def _cache_store(user_message: str, result: str):
+    try:
+        response_cache.store(user_message, CACHE_STAGE_PROCESS_ISSUE, result)
+    except Exception as e:
+        ERROR_COUNT.inc(where="semantic_cache", type=type(e).__name__)
+        logger.warning(f"Semantic cache store failed: {e}")
+
+def respond_sync(
+    user_message: str,
+    conversation_history: list = None,
+    bypass_cache: bool = False,
+    on_task_complete=None,
+    cancel_token: CancelToken = None,
+):
+    """
+    Answer a device issue, serving first-turn messages from the semantic cache when possible
+    
+    Args:
+        user_message: The user's message
+        conversation_history: Previous messages (the current one may be included)
+        bypass_cache: Always run the crew and don't store the result
+        on_task_complete: Optional callback(agent_role, output) invoked after each task
+        cancel_token: Optional token to stop the crew run early
+    """
+    cacheable, cached = _cache_lookup(user_message, conversation_history, bypass_cache)
+    if cached is not None:
+        return cached
+    
+    result = process_issue_sync(user_message, on_task_complete=on_task_complete, cancel_token=cancel_token)
+    
+    if cacheable:
+        _cache_store(user_message, result)
+    
+    return result
+
+async def respond_async(
+    user_message: str,
+    conversation_history: list = None,
+    bypass_cache: bool = False,
+    on_task_complete=None,
+    cancel_token: CancelToken = None,
+):
+    """Like respond_sync, with the crew run natively async (the cache calls use a worker thread)"""
+    cacheable, cached = await run_in_executor(_cache_lookup, user_message, conversation_history, bypass_cache)
+    if cached is not None:
+        return cached
+    
+    result = await process_issue_async(user_message, on_task_complete=on_task_complete, cancel_token=cancel_token)
+    
+    if cacheable:
+        await run_in_executor(_cache_store, user_message, result)
+    
+    return result
+
+async def respond(
+    user_message: str,
+    conversation_history: list = None,
+    bypass_cache: bool = False,
+    on_task_complete=None,
+    cancel_token: CancelToken = None,
+):
+    """Answer a device issue in the configured execution mode (see CREW_EXECUTION_MODE)"""
+    if CREW_EXECUTION_MODE == "async":
+        return await respond_async(user_message, conversation_history, bypass_cache, on_task_complete, cancel_token)
+    return await run_in_executor(
+        respond_sync, user_message, conversation_history, bypass_cache, on_task_complete, cancel_token
+    )
+
+def request_fingerprint(stage: str, request: DeviceIssueRequest) -> str:
+    """Fingerprint of everything that determines the response to a request"""
+    payload = json.dumps(
+        {
+            "stage": stage,
+            "user_message": request.user_message,
+            "conversation_history": request.conversation_history,
+            "bypass_cache": request.bypass_cache,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Default request deadline when the client does not send one (unset = no deadline)
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS") or 0) or None
+DISCONNECT_POLL_SECONDS = 0.5
+
+def request_deadline(request: DeviceIssueRequest) -> Optional[float]:
+    """Deadline in seconds for a request, falling back to REQUEST_DEADLINE_SECONDS"""
+    if request.deadline_seconds and request.deadline_seconds > 0:
+        return request.deadline_seconds
+    return DEFAULT_DEADLINE_SECONDS
+
+def cancelled_status_code(reason: str) -> int:
+    """HTTP status for a cancelled run: 504 on deadline, 499 (client closed request) otherwise"""
+    return 504 if reason == REASON_DEADLINE else 499
 
 @app.post("/process-issue", response_model=DeviceIssueResponse)
-async def process_device_issue(request: DeviceIssueRequest):
+async def process_device_issue(request: DeviceIssueRequest, http_request: Request):
     """
     Process a device support issue using CrewAI
     
+    The crew run is cancelled when the client disconnects or the request deadline
+    passes; it then stops before its next task or LLM call.
+    
     Args:
         request: DeviceIssueRequest with user message and conversation history
         
     Returns:
         DeviceIssueResponse with the agent's response
     """
+    deadline = request_deadline(request)
+    expires_at = time.monotonic() + deadline if deadline else None
+    # The shared run is stopped only when every waiting client has left; it is then
+    # cancelled for the reason this (leading) request left with
+    cancel_token = CancelToken()
+    leave_reason = [REASON_DISCONNECTED]
     try:
-        # Run the synchronous processing in a thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as pool:
-            result = await loop.run_in_executor(pool, process_issue_sync, request.user_message)
+        # Concurrent identical requests (e.g. client retries) wait on the same run
+        flight = asyncio.ensure_future(process_issue_flight.do(
+            request_fingerprint(CACHE_STAGE_PROCESS_ISSUE, request),
+            lambda: respond(
+                request.user_message,
+                request.conversation_history,
+                request.bypass_cache,
+                None,
+                cancel_token,
+            ),
+            on_abandoned=lambda: cancel_token.cancel(leave_reason[0]),
+        ))
+        
+        while not flight.done():
+            timeout = DISCONNECT_POLL_SECONDS
+            if expires_at is not None:
+                timeout = max(min(timeout, expires_at - time.monotonic()), 0)
+            await asyncio.wait({flight}, timeout=timeout)
+            if flight.done():
+                break
+            if await http_request.is_disconnected():
+                leave_reason[0] = REASON_DISCONNECTED
+            elif expires_at is not None and time.monotonic() >= expires_at:
+                leave_reason[0] = REASON_DEADLINE
+            else:
+                continue
+            # Stop waiting now; the worker stops at its next checkpoint
+            flight.cancel()
+            raise OperationCancelled(leave_reason[0])
+        result = flight.result()
         
         return DeviceIssueResponse(
             response=result,
             success=True
         )
         
+    except OperationCancelled as e:
+        logger.info(f"Request cancelled: {e.reason}")
+        raise HTTPException(status_code=cancelled_status_code(e.reason), detail=str(e))
     except Exception as e:
         logger.error(f"Error processing issue: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_job(job_id: str, request: JobRequest, webhook_url: Optional[str] = None):
+    """Run a crew job and record its progress and outcome in the job store"""
+    job_store.mark_running(job_id)
+    try:
+        result = await respond(
+            request.user_message,
+            request.conversation_history,
+            request.bypass_cache,
+            on_task_complete=lambda agent, output: job_store.add_partial_output(job_id, agent, output),
+            cancel_token=CancelToken(request_deadline(request)),
+        )
+        job_store.mark_succeeded(job_id, result)
+    except Exception as e:
+        job_store.mark_failed(job_id, str(e))
+    
+    if webhook_url:
+        job = job_store.get(job_id)
+        if job:
+            try:
+                await run_in_executor(send_webhook, webhook_url, job.to_dict())
+            except Exception as e:
+                ERROR_COUNT.inc(where="job_webhook", type=type(e).__name__)
+                logger.warning(f"Webhook for job {job_id} failed: {e}")
+
+@app.post("/jobs", response_model=JobSubmittedResponse, status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Submit a device support issue for asynchronous processing
+    
+    Args:
+        request: JobRequest with user message and optional local webhook URL
+        
+    Returns:
+        JobSubmittedResponse with the job id to poll
+    """
+    webhook_url = None
+    if request.webhook_url:
+        try:
+            # Resolves the host: keep the DNS lookup off the event loop
+            webhook_url = await run_in_executor(validate_webhook_url, request.webhook_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        job = job_store.create(request.user_message, webhook_url=webhook_url)
+    except JobStoreFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    task = asyncio.create_task(run_job(job.job_id, request, webhook_url))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+    
+    return JobSubmittedResponse(
+        job_id=job.job_id,
+        status=job.status,
+        status_url=f"/jobs/{job.job_id}",
+    )
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Get status, partial output and result of a job
+    
+    Args:
+        job_id: Id returned by POST /jobs
+        
+    Returns:
+        JobStatusResponse with the current job state
+    """
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return JobStatusResponse(**job.to_dict())
+
+@app.websocket("/ws/chat")
+async def websocket_chat(websocket: WebSocket):
+    """
+    Interactive chat over a WebSocket with session state and agents bound to the connection
+    
+    Client messages (JSON, or plain text as a shortcut for "message"):
+        {"type": "message", "content": "..."}
+        {"type": "solved"} / {"type": "not_solved"} - result of the last troubleshooting step
+        {"type": "cancel"} - stop the turn that is currently running
+    
+    Server messages:
+        {"type": "session", ...state}
+        {"type": "progress", "stage": "...", "detail": "..."}
+        {"type": "token", "content": "..."} - streamed LLM output
+        {"type": "response", "content": "...", "session": {...state}}
+        {"type": "cancelled", "reason": "..."}
+        {"type": "error", "detail": "..."}
+    
+    Disconnecting cancels the running turn before its next LLM call.
+    """
+    from session import SupportSession
+    
+    await websocket.accept()
+    if not rag_service:
+        await websocket.send_json({"type": "error", "detail": "RAG Service not initialized"})
+        await websocket.close(code=1013)
+        return
+    
+    loop = asyncio.get_running_loop()
+    outbox = asyncio.Queue()
+    inbox = asyncio.Queue()
+    turn_token: Optional[CancelToken] = None
+    
+    def push(event: dict):
+        """Queue an event for the client (safe to call from worker threads)"""
+        loop.call_soon_threadsafe(outbox.put_nowait, event)
+    
+    async def send_events():
+        try:
+            while True:
+                event = await outbox.get()
+                await websocket.send_json(event)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+    
+    async def receive_messages():
+        """Read client messages; cancel requests and disconnects act on the running turn"""
+        try:
+            while True:
+                raw = await websocket.receive_text()
+                try:
+                    data = json.loads(raw)
+                except ValueError:
+                    data = {"type": "message", "content": raw}
+                if not isinstance(data, dict):
+                    data = {"type": "message", "content": str(data)}
+                
+                if data.get("type") == "cancel":
+                    if turn_token:
+                        turn_token.cancel(REASON_CLIENT_REQUEST)
+                    else:
+                        push({"type": "error", "detail": "No turn is running"})
+                    continue
+                await inbox.put(data)
+        except WebSocketDisconnect:
+            if turn_token:
+                turn_token.cancel(REASON_DISCONNECTED)
+        finally:
+            await inbox.put(None)
+    
+    WEBSOCKET_CONNECTIONS.inc()
+    sender = asyncio.create_task(send_events())
+    receiver = None
+    session = None
+    try:
+        session = await run_in_executor(SupportSession, rag_service, True)
+        session.subscribe_tokens(lambda chunk: push({"type": "token", "content": chunk}))
+        push({"type": "session", **session.to_dict()})
+        receiver = asyncio.create_task(receive_messages())
+        
+        while True:
+            data = await inbox.get()
+            if data is None:
+                break
+            
+            kind = data.get("type", "message")
+            if kind in ("solved", "not_solved") and not session.awaiting_solution_confirmation:
+                push({"type": "error", "detail": "No troubleshooting step is awaiting confirmation"})
+                continue
+            try:
+                if kind == "solved":
+                    response = session.mark_solved()
+                elif kind == "not_solved":
+                    # May wait for the speculated next step, so off the event loop and cancellable
+                    turn_token = CancelToken(DEFAULT_DEADLINE_SECONDS)
+                    try:
+                        response = await run_in_executor(session.mark_not_solved, turn_token)
+                    finally:
+                        turn_token = None
+                elif kind == "message" and str(data.get("content", "")).strip():
+                    turn_token = CancelToken(DEFAULT_DEADLINE_SECONDS)
+                    try:
+                        response = await run_in_executor(
+                            session.handle_message, str(data["content"]).strip(), push, turn_token
+                        )
+                    finally:
+                        turn_token = None
+                else:
+                    push({"type": "error", "detail": f"Unsupported message: {kind}"})
+                    continue
+            except OperationCancelled as e:
+                push({"type": "cancelled", "reason": e.reason})
+                continue
+            except Exception as e:
+                ERROR_COUNT.inc(where="websocket_chat", type=type(e).__name__)
+                logger.error(f"Error in chat session {session.session_id}: {e}")
+                push({"type": "error", "detail": str(e)})
+                continue
+            
+            push({"type": "response", "content": response, "session": session.to_dict()})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if turn_token:
+            turn_token.cancel(REASON_DISCONNECTED)
+        if session:
+            session.unsubscribe_tokens()
+            session.close()
+        if receiver:
+            receiver.cancel()
+        sender.cancel()
+        WEBSOCKET_CONNECTIONS.dec()
+
 @app.post("/search-knowledge-base")
 async def search_knowledge_base(query: str):
     """
@@ -189,5 +898,6 @@ async def search_knowledge_base(query: str):
         }
         
     except Exception as e:
+        ERROR_COUNT.inc(where="search_knowledge_base", type=type(e).__name__)
         logger.error(f"Error searching knowledge base: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,204 @@
+"""
+Local device identification
+Recognizes the supported device models in a user message (exact model numbers,
+spacing and spelling variants, bare or spelled-out model numbers, and near-miss
+typos) with a confidence score, so the device stage can be answered without an
+LLM call when the message is unambiguous
+"""
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from metrics import registry
+
+DEVICE_MATCHES = registry.counter(
+    "crewai_device_matches_total", "Device identification attempts by outcome", ["result"]
+)
+
+# Confidence per kind of evidence
+CONFIDENCE_EXACT = 1.0
+CONFIDENCE_ALIAS = 0.9
+CONFIDENCE_NUMBER = 0.85
+CONFIDENCE_FUZZY = {1: 0.75, 2: 0.4}
+# A second device scoring within this margin of the best makes the match ambiguous
+AMBIGUITY_MARGIN = 0.2
+
+_DIGIT_WORDS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+_MODEL_TOKEN = re.compile(r"\b([a-z]{1,3})([\s\-_.]?)(\d{2,4})\b", re.IGNORECASE)
+_NUMBER_TOKEN = re.compile(r"(?<![\w.])(\d{3})(?![\w.])")
+_WORD = re.compile(r"[a-z0-9']+")
+
+_AFFIRMATIVE = {
+    "yes", "yeah", "yep", "yup", "correct", "right", "exactly", "sure", "indeed",
+    "affirmative", "y", "ok", "okay", "confirmed", "true",
+}
+_NEGATIVE = {"no", "nope", "nah", "wrong", "incorrect", "n", "not", "isn't", "false"}
+
+
+@dataclass
+class DeviceMatch:
+    """Outcome of matching a message against the device catalog"""
+    device: Optional[str]
+    confidence: float
+    method: str  # "exact", "alias", "number", "fuzzy" or "none"
+    matched_text: str = ""
+    alternatives: List[str] = field(default_factory=list)
+
+    @property
+    def ambiguous(self) -> bool:
+        return bool(self.alternatives)
+
+
+def _normalize_code(prefix: str, number: str) -> str:
+    return f"{prefix.upper()}{number}"
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance (model codes are short, so the quadratic version is fine)"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _spelled(number: str) -> str:
+    return " ".join(_DIGIT_WORDS[int(digit)] for digit in number)
+
+
+class DeviceMatcher:
+    """Matches free text against a catalog of device model numbers"""
+
+    def __init__(self, devices: Iterable[Tuple[str, str]], aliases: Dict[str, Iterable[str]] = None):
+        """
+        Initialize the matcher
+
+        Args:
+            devices: Supported (device id, description) pairs, e.g. agents.device_catalog()
+            aliases: Optional extra names per device id
+        """
+        self.descriptions = dict(devices)
+        self.devices = list(self.descriptions)
+        self.numbers: Dict[str, List[str]] = {}
+        self.aliases: Dict[str, str] = {}
+        self.prefixes = set()
+        for device in self.devices:
+            parsed = _MODEL_TOKEN.fullmatch(device)
+            if parsed:
+                prefix, _, number = parsed.groups()
+                self.prefixes.add(prefix.upper())
+                self.numbers.setdefault(number, []).append(device)
+                self.aliases[f"{prefix.lower()} {_spelled(number)}"] = device
+                self.aliases[f"model {number}"] = device
+            for alias in (aliases or {}).get(device, ()):
+                self.aliases[" ".join(_WORD.findall(alias.lower()))] = device
+
+    def match(self, text: str) -> DeviceMatch:
+        """
+        Identify the device mentioned in a message
+
+        Args:
+            text: User message
+
+        Returns:
+            The best match; device is None if nothing matched, and alternatives
+            lists other devices that scored about as well
+        """
+        scores: Dict[str, Tuple[float, str, str]] = {}
+
+        def consider(device: str, confidence: float, method: str, matched: str):
+            if confidence > scores.get(device, (0.0,))[0]:
+                scores[device] = (confidence, method, matched)
+
+        for token in _MODEL_TOKEN.finditer(text):
+            prefix, separator, number = token.groups()
+            if separator.isspace() and prefix.upper() not in self.prefixes:
+                continue  # "the 222", "for 130": a bare number, handled below
+            code = _normalize_code(prefix, number)
+            for device in self.devices:
+                distance = _edit_distance(code, device)
+                if distance == 0:
+                    consider(device, CONFIDENCE_EXACT, "exact", token.group(0))
+                elif distance in CONFIDENCE_FUZZY:
+                    consider(device, CONFIDENCE_FUZZY[distance], "fuzzy", token.group(0))
+
+        words = " ".join(_WORD.findall(text.lower()))
+        for alias, device in self.aliases.items():
+            if re.search(rf"\b{re.escape(alias)}\b", words):
+                consider(device, CONFIDENCE_ALIAS, "alias", alias)
+
+        for token in _NUMBER_TOKEN.finditer(text):
+            for device in self.numbers.get(token.group(1), ()):
+                consider(device, CONFIDENCE_NUMBER, "number", token.group(0))
+
+        if not scores:
+            return DeviceMatch(device=None, confidence=0.0, method="none")
+
+        ranked = sorted(scores.items(), key=lambda item: item[1][0], reverse=True)
+        device, (confidence, method, matched) = ranked[0]
+        alternatives = [other for other, (score, _, _) in ranked[1:] if confidence - score < AMBIGUITY_MARGIN]
+        if alternatives:
+            # Several devices are plausible: let the device agent ask
+            confidence = round(confidence / (len(alternatives) + 1), 3)
+        return DeviceMatch(
+            device=device,
+            confidence=confidence,
+            method=method,
+            matched_text=matched,
+            alternatives=alternatives,
+        )
+
+    def describe(self, device: str) -> str:
+        return self.descriptions.get(device, device)
+
+
+@lru_cache(maxsize=8)
+def matcher_for(devices: Tuple[Tuple[str, str], ...]) -> DeviceMatcher:
+    """Matcher for a device catalog (built once per catalog)"""
+    return DeviceMatcher(devices)
+
+
+def identify_device(text: str, devices: Tuple[Tuple[str, str], ...], min_confidence: float = None) -> Optional[str]:
+    """
+    Device a text names clearly enough to scope a knowledge base search by
+
+    Args:
+        text: Message or device agent answer
+        devices: Device catalog, e.g. agents.device_catalog()
+        min_confidence: Threshold (defaults to DeviceMatchConfig.min_confidence)
+
+    Returns:
+        The device id, or None for no, an ambiguous or a weak match
+    """
+    match = matcher_for(devices).match(text)
+    threshold = config.device_match.min_confidence if min_confidence is None else min_confidence
+    if match.ambiguous or match.confidence < threshold:
+        return None
+    return match.device
+
+
+def parse_confirmation(text: str) -> Optional[bool]:
+    """
+    Read a yes/no answer to a confirmation question
+
+    Returns:
+        True for yes, False for no, None if the message is neither
+    """
+    words = _WORD.findall(text.lower())
+    if not words or len(words) > 12:
+        return None
+    lead = words[:3]
+    if any(word in _NEGATIVE for word in lead):
+        return False
+    if any(word in _AFFIRMATIVE for word in lead):
+        return True
+    return None
+
+
+def record_outcome(result: str):
+    """Count how a device identification was answered ("local", "agent", "rejected")"""
+    DEVICE_MATCHES.inc(result=result)
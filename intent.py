@@ -0,0 +1,270 @@
+"""
+Local intent classification of user replies during troubleshooting
+Tells "that fixed it" from "still not working", a follow-up question or an
+off-topic message without an LLM call, using a phrase lexicon and, optionally,
+a small naive Bayes model trained from logged replies.
+
+Train a model from a reply log (JSON lines with "text" and "label" or "intent"):
+    python intent.py train intent_log.jsonl intent_model.json
+"""
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+
+INTENT_SOLVED = "solved"
+INTENT_NOT_SOLVED = "not_solved"
+INTENT_MORE_INFO = "more_info"
+INTENT_OFF_TOPIC = "off_topic"
+INTENTS = (INTENT_SOLVED, INTENT_NOT_SOLVED, INTENT_MORE_INFO, INTENT_OFF_TOPIC)
+
+# (pattern, weight) per intent; weights below 1 mark weak evidence such as a bare "no".
+# A contraction's "n't" follows a letter, so it cannot sit behind a word boundary.
+_NEGATED_SUCCESS = r"(?:\b(?:not|never|no longer|nothing)\b|n't\b)(?:\s+\w+){0,2}?\s+(?:fixed|fix|work|works|working|worked|solved|resolved|help|helped|changed|better)\b"
+# A final "no" answers the reply's own question ("the problem is solved? no")
+_TRAILING_NO = r"\b(?:no|nope|nah)\W*$"
+LEXICON: Dict[str, Tuple[Tuple[str, float], ...]] = {
+    INTENT_NOT_SOLVED: (
+        (_NEGATED_SUCCESS, 1.0),
+        (r"\b(?:didn't|did not|doesn't|does not|won't|can't)\s+(?:work|help|fix)", 1.0),
+        (r"\bstill\b", 0.8),
+        (r"\b(?:no luck|same (?:problem|issue|thing)|no (?:change|difference)|not really|nothing happened|didn't do anything)\b", 1.0),
+        (r"\b(?:unfortunately|sadly)\b", 0.5),
+        # Partial fixes: "it works but only sometimes", "fixed the noise but it won't make ice"
+        (r"\b(?:only sometimes|sometimes|intermittently|now and then|on and off|partly|partially)\b", 0.8),
+        (r"\bbut\b[^.!?]*\b(?:not|never|doesn't|won't|isn't|can't|didn't|still)\b", 1.0),
+        (r"^\s*(?:no|nope|nah)\b", 0.6),
+        (_TRAILING_NO, 0.6),
+        (r"\bno\b", 0.5),
+    ),
+    INTENT_SOLVED: (
+        (r"\b(?:fixed|solved|resolved)\b(?!\s+to\b)", 1.0),  # not "I resolved to try again"
+        (r"\b(?:it|that|this)\s+(?:worked|works|did it|did the trick|helped)\b", 1.0),
+        (r"\b(?:working|works|fine|normal)\s+(?:again|now)\b", 1.0),
+        (r"\b(?:back to normal|problem is gone|issue is gone|all good|making ice again)\b", 1.0),
+        (r"\b(?:great|perfect|awesome|excellent|thanks|thank you)\b", 0.4),
+        # A bare "yes" or "ok" may only acknowledge the step: too weak to close the session alone
+        (r"^\s*(?:yes|yeah|yep|yup)\b", 0.4),
+        (r"^\s*(?:ok|okay)\b", 0.1),
+    ),
+    INTENT_MORE_INFO: (
+        (r"\?\s*$", 0.8),
+        (r"\b(?:how do i|how can i|how long|where is|where can i|where do i|which one|what do you mean|what is|what's)\b", 1.0),
+        (r"\b(?:can you explain|could you explain|i don't understand|not sure how|don't know how|can't find|cannot find)\b", 1.0),
+    ),
+    INTENT_OFF_TOPIC: (
+        (r"\b(?:weather|joke|football|movie|recipe|stock|bitcoin|politics|your name|who are you|are you a bot)\b", 1.0),
+    ),
+}
+_COMPILED = {
+    intent: tuple((re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in patterns)
+    for intent, patterns in LEXICON.items()
+}
+
+# Phrases in a solver answer that mean the troubleshooting is over
+RESOLUTION_MARKERS = (
+    "glad it's working", "glad it is working", "glad that worked", "glad that fixed",
+    "issue is resolved", "issue has been resolved", "problem is solved", "problem has been solved",
+)
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+@dataclass
+class IntentResult:
+    """Classified intent with a 0-1 confidence and the classifier that decided it"""
+    intent: Optional[str]
+    confidence: float
+    source: str  # "lexicon", "model" or "none"
+
+
+def lexicon_scores(text: str) -> Dict[str, float]:
+    """Summed pattern weights per intent"""
+    scores = {}
+    for intent, patterns in _COMPILED.items():
+        score = sum(weight for pattern, weight in patterns if pattern.search(text))
+        if score:
+            scores[intent] = score
+    # "not fixed" also contains "fixed", and "fixed the noise but it still leaks" is only a
+    # partial fix: any evidence against success rules it out (the session stays open)
+    if INTENT_NOT_SOLVED in scores:
+        scores.pop(INTENT_SOLVED, None)
+    return scores
+
+
+def _tokens(text: str) -> List[str]:
+    words = _TOKEN.findall(text.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesIntentModel:
+    """Multinomial naive Bayes over word unigrams and bigrams"""
+
+    def __init__(self, class_counts: Dict[str, int] = None, token_counts: Dict[str, Dict[str, int]] = None):
+        self.class_counts = dict(class_counts or {})
+        self.token_counts = {label: Counter(counts) for label, counts in (token_counts or {}).items()}
+        self._refresh()
+
+    def _refresh(self):
+        self.vocabulary = set()
+        for counts in self.token_counts.values():
+            self.vocabulary.update(counts)
+        self.totals = {label: sum(counts.values()) for label, counts in self.token_counts.items()}
+
+    def train(self, examples: Iterable[Tuple[str, str]]) -> "NaiveBayesIntentModel":
+        """Add (text, intent) examples"""
+        for text, label in examples:
+            self.class_counts[label] = self.class_counts.get(label, 0) + 1
+            self.token_counts.setdefault(label, Counter()).update(_tokens(text))
+        self._refresh()
+        return self
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Most likely intent and its posterior probability
+
+        Returns:
+            (None, 0.0) for an untrained model
+        """
+        if not self.class_counts:
+            return None, 0.0
+        documents = sum(self.class_counts.values())
+        vocabulary = len(self.vocabulary) or 1
+        tokens = _tokens(text)
+        log_probs = {}
+        for label, count in self.class_counts.items():
+            counts, total = self.token_counts.get(label, Counter()), self.totals.get(label, 0)
+            log_prob = math.log(count / documents)
+            for token in tokens:
+                log_prob += math.log((counts[token] + 1) / (total + vocabulary))
+            log_probs[label] = log_prob
+        best = max(log_probs, key=log_probs.get)
+        norm = sum(math.exp(value - log_probs[best]) for value in log_probs.values())
+        return best, 1.0 / norm
+
+    def to_dict(self) -> dict:
+        return {
+            "class_counts": self.class_counts,
+            "token_counts": {label: dict(counts) for label, counts in self.token_counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NaiveBayesIntentModel":
+        return cls(data.get("class_counts"), data.get("token_counts"))
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesIntentModel":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+class IntentClassifier:
+    """Lexicon first; the naive Bayes model, if any, decides what the lexicon cannot"""
+
+    def __init__(self, model: Optional[NaiveBayesIntentModel] = None, min_confidence: float = 0.6):
+        """
+        Initialize the classifier
+
+        Args:
+            model: Optional trained model for replies the lexicon is unsure about
+            min_confidence: Results below this confidence come back with intent None
+        """
+        self.model = model
+        self.min_confidence = min_confidence
+
+    def classify(self, text: str) -> IntentResult:
+        """
+        Classify a user reply
+
+        Args:
+            text: User message
+
+        Returns:
+            The intent, or intent None if neither the lexicon nor the model is confident
+        """
+        scores = lexicon_scores(text)
+        if scores:
+            best = max(scores, key=scores.get)
+            # Strength of the evidence times its share of all evidence
+            confidence = min(scores[best], 1.0) * scores[best] / sum(scores.values())
+            if confidence >= self.min_confidence:
+                return IntentResult(best, round(confidence, 3), "lexicon")
+        if self.model is not None:
+            intent, probability = self.model.predict(text)
+            if intent and probability >= self.min_confidence:
+                return IntentResult(intent, round(probability, 3), "model")
+        return IntentResult(None, 0.0, "none")
+
+
+def agent_reports_resolution(agent_response: str) -> bool:
+    """Whether a solver answer says the problem is solved (the stage can end)"""
+    lowered = agent_response.lower()
+    return any(marker in lowered for marker in RESOLUTION_MARKERS)
+
+
+_classifier: Optional[IntentClassifier] = None
+_log_lock = threading.Lock()
+
+
+def get_classifier() -> IntentClassifier:
+    """Classifier configured by IntentConfig (the model is loaded once)"""
+    global _classifier
+    if _classifier is None:
+        settings = config.intent
+        model = None
+        if settings.model_path and os.path.exists(settings.model_path):
+            model = NaiveBayesIntentModel.load(settings.model_path)
+        _classifier = IntentClassifier(model=model, min_confidence=settings.min_confidence)
+    return _classifier
+
+
+def log_reply(text: str, result: IntentResult, stage: str):
+    """Append a classified reply to the reply log (if configured), the training data of the model"""
+    path = config.intent.log_path
+    if not path:
+        return
+    entry = {"ts": time.time(), "stage": stage, "text": text,
+             "intent": result.intent, "confidence": result.confidence, "source": result.source}
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    """(text, intent) pairs from a reply log; a reviewed "label" wins over the logged "intent" """
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            label = entry.get("label") or entry.get("intent")
+            if label in INTENTS and entry.get("text"):
+                examples.append((entry["text"], label))
+    return examples
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 3 or argv[0] != "train":
+        print("Usage: python intent.py train <reply_log.jsonl> <model.json>")
+        return 2
+    examples = load_examples(argv[1])
+    model = NaiveBayesIntentModel().train(examples)
+    model.save(argv[2])
+    print(f"Trained on {len(examples)} replies: {model.class_counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
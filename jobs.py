@@ -0,0 +1,277 @@
+"""
+Asynchronous job tracking for long-running crew runs
+Jobs are kept in a TTL-bounded in-memory store and can notify a local webhook on completion
+"""
+import functools
+import http.client
+import ipaddress
+import json
+import socket
+import threading
+import time
+import uuid
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+@dataclass
+class Job:
+    """State of a single submitted crew run"""
+    job_id: str
+    user_message: str
+    webhook_url: Optional[str] = None
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    partial_output: List[dict] = field(default_factory=list)
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> dict:
+        """Public view of the job returned by the API and sent to webhooks"""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "partial_output": list(self.partial_output),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStoreFullError(Exception):
+    """Raised when the store has no room for another unfinished job"""
+
+
+class JobStore:
+    """Thread-safe in-memory job store with TTL-based retention of finished jobs"""
+
+    def __init__(self, ttl_seconds: float = 3600, max_jobs: int = 1000):
+        """
+        Initialize the job store
+
+        Args:
+            ttl_seconds: How long finished jobs are kept after completion
+            max_jobs: Maximum number of jobs held at once
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: float):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def create(self, user_message: str, webhook_url: Optional[str] = None) -> Job:
+        """
+        Register a new queued job
+
+        Raises:
+            JobStoreFullError: If max_jobs unfinished jobs are already held
+        """
+        with self._lock:
+            now = time.time()
+            self._purge_expired(now)
+            if len(self._jobs) >= self.max_jobs:
+                # Make room by dropping the oldest finished jobs first
+                finished = sorted(
+                    (job for job in self._jobs.values() if job.finished),
+                    key=lambda job: job.finished_at,
+                )
+                for job in finished[:len(self._jobs) - self.max_jobs + 1]:
+                    del self._jobs[job.job_id]
+            if len(self._jobs) >= self.max_jobs:
+                raise JobStoreFullError(f"Too many pending jobs ({self.max_jobs})")
+            job = Job(job_id=uuid.uuid4().hex, user_message=user_message, webhook_url=webhook_url)
+            self._jobs[job.job_id] = job
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by id, or None if unknown or expired"""
+        with self._lock:
+            self._purge_expired(time.time())
+            return self._jobs.get(job_id)
+
+    def mark_running(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+
+    def add_partial_output(self, job_id: str, agent: str, output: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.partial_output.append({"agent": agent, "output": output})
+
+    def mark_succeeded(self, job_id: str, result: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.status = JOB_SUCCEEDED
+                job.result = result
+                job.finished_at = time.time()
+
+    def mark_failed(self, job_id: str, error: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.status = JOB_FAILED
+                job.error = error
+                job.finished_at = time.time()
+
+    def stats(self) -> dict:
+        """Count of held jobs per status"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+
+def resolve_webhook_address(url: str) -> Tuple[str, int]:
+    """
+    Resolve a webhook URL and check that its host is local (loopback or private network)
+
+    Blocks on DNS: call it from a worker thread in async code.
+
+    Args:
+        url: Webhook URL supplied by the client
+
+    Returns:
+        (address, port) to connect to
+
+    Raises:
+        ValueError: If the URL is malformed or points outside the local network
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("webhook_url must be an http(s) URL")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)]
+    except socket.gaierror:
+        raise ValueError(f"webhook_url host '{parsed.hostname}' cannot be resolved")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not (ip.is_loopback or ip.is_private):
+            raise ValueError("webhook_url must point to a local or private network host")
+    return addresses[0], port
+
+
+def validate_webhook_url(url: str) -> str:
+    """
+    Check that a webhook URL points at a local (loopback or private network) host
+
+    Blocks on DNS: call it from a worker thread in async code.
+
+    Args:
+        url: Webhook URL supplied by the client
+
+    Returns:
+        The URL unchanged if valid
+
+    Raises:
+        ValueError: If the URL is malformed or points outside the local network
+    """
+    resolve_webhook_address(url)
+    return url
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """Connects to an address validated beforehand instead of resolving the host again"""
+
+    def __init__(self, host, address: str = None, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """TLS to a validated address; the certificate is still checked against the host name"""
+
+    def __init__(self, host, address: str = None, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+class _PinnedHTTPHandler(urllib.request.HTTPHandler):
+    def __init__(self, address: str):
+        super().__init__()
+        self.address = address
+
+    def http_open(self, req):
+        return self.do_open(functools.partial(_PinnedHTTPConnection, address=self.address), req)
+
+
+class _PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+    def __init__(self, address: str):
+        super().__init__()
+        self.address = address
+
+    def https_open(self, req):
+        return self.do_open(functools.partial(_PinnedHTTPSConnection, address=self.address), req,
+                            context=self._context)
+
+
+class _NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """A redirect could lead outside the local network: fail with the 3xx instead"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def send_webhook(url: str, payload: dict, timeout: float = 5.0):
+    """
+    POST a JSON payload to a webhook URL
+
+    The host is validated again and the request goes to the validated address,
+    so a DNS change since the job was submitted cannot redirect it; HTTP
+    redirects are not followed.
+
+    Raises:
+        ValueError: If the URL no longer points at a local host
+        OSError: If the request fails (including a redirect response)
+    """
+    address, _ = resolve_webhook_address(url)
+    opener = urllib.request.build_opener(
+        _PinnedHTTPHandler(address), _PinnedHTTPSHandler(address), _NoRedirectHandler()
+    )
+    body = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(
+        url,
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with opener.open(request, timeout=timeout) as response:
+        response.read()
@@ -0,0 +1,137 @@
+"""
+Knowledge base search tool for the problem solver agent
+A CrewAI tool around RAGService.search_solutions, so the agent can look up more
+solutions when the ones in its prompt are not enough. Identical searches within
+a session are answered from a memo, and each turn has a budget of real searches.
+"""
+import threading
+from typing import Dict, Optional, Tuple, Type
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field, PrivateAttr
+
+from config import config
+from metrics import registry
+
+KB_TOOL_CALLS = registry.counter(
+    "crewai_kb_tool_calls_total",
+    "Knowledge base tool calls by result (searched, memo, over_budget, failed)",
+    ["result"],
+)
+
+OVER_BUDGET_MESSAGE = (
+    "Knowledge base search limit reached for this turn. "
+    "Answer with the solutions you already have."
+)
+
+
+class KnowledgeBaseQuery(BaseModel):
+    """Arguments of the knowledge base tool"""
+    device_type: str = Field(..., description="Device model, e.g. 'EH222'")
+    problem_description: str = Field(..., description="Short description of the problem or the step you need help with")
+    error_code: Optional[str] = Field(None, description="Error code shown by the device, if any, e.g. 'E5'")
+
+
+class SearchMemo:
+    """Tool results of one session by normalized arguments, shared by its tools"""
+
+    def __init__(self):
+        self._results: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(device_type: str, problem_description: str, error_code: Optional[str]) -> Tuple:
+        return (
+            device_type.strip().upper(),
+            " ".join(problem_description.lower().split()),
+            (error_code or "").strip().upper(),
+        )
+
+    def get(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            return self._results.get(key)
+
+    def put(self, key: Tuple, result: str):
+        with self._lock:
+            self._results[key] = result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+
+def format_tool_result(solutions) -> str:
+    """Search results as the text the agent reads"""
+    if not solutions:
+        return "No matching solutions found in the knowledge base."
+
+    result = "Found relevant solutions:\n\n"
+    for i, sol in enumerate(solutions, 1):
+        result += f"Solution {i} (Relevance: {sol['score']:.2f}):\n"
+        result += f"  Problem: {sol['problem']}\n"
+        result += f"  Solution: {sol['solution']}\n"
+        if sol.get('manual_reference'):
+            result += f"  Manual Reference: {sol['manual_reference']}\n"
+        result += "\n"
+    return result
+
+
+class KnowledgeBaseTool(BaseTool):
+    """Searches the solution knowledge base, memoized per session and budgeted per turn"""
+
+    name: str = "search_knowledge_base"
+    description: str = (
+        "Search the device support knowledge base for known solutions to a problem. "
+        "Use it only when the solutions already given to you do not cover the user's situation."
+    )
+    args_schema: Type[BaseModel] = KnowledgeBaseQuery
+    rag_service: object = Field(default=None, exclude=True)
+    memo: SearchMemo = Field(default_factory=SearchMemo, exclude=True)
+    max_calls_per_turn: int = Field(default_factory=lambda: config.kb_tool.max_calls_per_turn)
+    limit: int = 3
+    _calls_this_turn: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def new_turn(self):
+        """Reset the search budget (call at the start of every turn)"""
+        with self._lock:
+            self._calls_this_turn = 0
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._calls_this_turn >= self.max_calls_per_turn:
+                return False
+            self._calls_this_turn += 1
+            return True
+
+    def _run(self, device_type: str, problem_description: str, error_code: Optional[str] = None) -> str:
+        if not self.rag_service:
+            return "No RAG service available."
+
+        key = SearchMemo.key(device_type, problem_description, error_code)
+        cached = self.memo.get(key)
+        if cached is not None:
+            KB_TOOL_CALLS.inc(result="memo")
+            return cached
+        if not self._spend():
+            KB_TOOL_CALLS.inc(result="over_budget")
+            return OVER_BUDGET_MESSAGE
+
+        try:
+            solutions = self.rag_service.search_solutions(
+                device_type,
+                problem_description,
+                limit=self.limit,
+                filters={"error_code": key[2]} if key[2] else None,
+            )
+            if not solutions and key[2]:
+                # The error code may not be recorded for the matching solutions
+                solutions = self.rag_service.search_solutions(device_type, problem_description, limit=self.limit)
+        except Exception as e:
+            KB_TOOL_CALLS.inc(result="failed")
+            return f"Knowledge base search failed: {e}"
+
+        result = format_tool_result(solutions)
+        self.memo.put(key, result)
+        KB_TOOL_CALLS.inc(result="searched")
+        return result
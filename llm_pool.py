@@ -0,0 +1,125 @@
+"""
+Process-wide pool of LLM clients
+Agents get their own lightweight LLM object (CrewAI sets per-agent stop words and
+tracks token usage on it), but objects with the same (model, temperature, params)
+share one provider client and with it the keep-alive HTTP connection pool, so
+building agents per turn no longer opens new connections and TLS sessions
+"""
+import copy
+import threading
+from typing import Any, Dict, Hashable, Tuple
+
+from metrics import registry
+
+LLM_POOL_LOOKUPS = registry.counter(
+    "llm_pool_lookups_total", "LLM client pool lookups by result", ["result"]
+)
+LLM_POOL_CLIENTS = registry.gauge(
+    "llm_pool_clients", "Distinct LLM clients held by the pool"
+)
+
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable form of a parameter value for the pool key"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class LLMPool:
+    """Thread-safe registry of LLM prototypes keyed by (model, temperature, params)"""
+
+    def __init__(self):
+        self._prototypes: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model: str, temperature, params: dict) -> Tuple:
+        return (model, temperature, _freeze(params))
+
+    @staticmethod
+    def _build(model: str, temperature, params: dict):
+        from crewai import LLM
+        return LLM(model=model, temperature=temperature, **params)
+
+    def get(self, model: str, temperature: float = None, stream: bool = False, **params):
+        """
+        Get an LLM for an agent, sharing the provider client with equal configurations
+
+        Args:
+            model: Model name
+            temperature: Sampling temperature
+            stream: Stream the response (does not need a separate client)
+            **params: Further LLM parameters, part of the pool key
+
+        Returns:
+            A new LLM object backed by the pooled client
+        """
+        key = self._key(model, temperature, params)
+        with self._lock:
+            prototype = self._prototypes.get(key)
+            if prototype is None:
+                LLM_POOL_LOOKUPS.inc(result="miss")
+                prototype = self._build(model, temperature, params)
+                self._prototypes[key] = prototype
+                LLM_POOL_CLIENTS.set(len(self._prototypes))
+            else:
+                LLM_POOL_LOOKUPS.inc(result="hit")
+        return self._instance(prototype, stream)
+
+    @staticmethod
+    def _instance(prototype, stream: bool):
+        # Shallow copy: the client objects are shared, the per-agent state is not
+        llm = copy.copy(prototype)
+        llm.stream = stream
+        llm.stop = list(getattr(prototype, "stop", None) or [])
+        llm.additional_params = dict(getattr(prototype, "additional_params", None) or {})
+        if hasattr(prototype, "_token_usage"):
+            llm._token_usage = {name: 0 for name in prototype._token_usage}
+        _track_finish_reason(llm)
+        return llm
+
+    def clear(self):
+        """Drop all pooled clients (new ones are built on the next lookup)"""
+        with self._lock:
+            self._prototypes.clear()
+            LLM_POOL_CLIENTS.set(0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._prototypes)
+
+
+def _track_finish_reason(llm):
+    """
+    Keep the provider's finish reason of the last response on the LLM as
+    last_finish_reason (read by the truncation metrics). OpenAI responses only;
+    streamed responses do not report it.
+    """
+    extract_usage = getattr(type(llm), "_extract_openai_token_usage", None)
+    if extract_usage is None:
+        return
+
+    def extract_usage_and_finish_reason(response):
+        choices = getattr(response, "choices", None)
+        if choices:
+            llm.last_finish_reason = getattr(choices[0], "finish_reason", None)
+        return extract_usage(llm, response)
+
+    llm.last_finish_reason = None
+    llm._extract_openai_token_usage = extract_usage_and_finish_reason
+
+
+# Global pool instance
+pool = LLMPool()
+
+
+def get_llm(model: str, temperature: float = None, stream: bool = False, **params):
+    """Get an LLM backed by the global pool (see LLMPool.get)"""
+    return pool.get(model, temperature=temperature, stream=stream, **params)
@@ -0,0 +1,275 @@
+"""
+Offline load test for the CrewAI API pipeline
+Runs crewai_api.app in-process with a fake LLM, the local embedding stand-in and
+Qdrant in :memory: mode, drives /process-issue concurrently and reports
+throughput plus p50/p95/p99 latency per stage as JSON.
+
+Usage:
+    python loadtest.py --requests 50 --concurrency 10 --llm-latency 0.2 --tokens-per-second 200
+    # Thread vs native async crew execution (see CREW_EXECUTION_MODE) at high concurrency
+    python loadtest.py --mode compare --requests 200 --concurrency 200 --workers 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+os.environ.setdefault("CREWAI_TELEMETRY_OPT_OUT", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OPENAI_API_KEY", "offline-load-test")
+
+import httpx
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM
+from qdrant_client.models import Distance, VectorParams
+
+import agents
+import crewai_api
+from metrics import STAGE_LATENCY, LLM_LATENCY, RAG_EMBED_LATENCY, RAG_SEARCH_LATENCY, EXECUTOR_ACTIVE, ASYNC_CREWS_ACTIVE
+from rag_service import RAGService, LocalHashEmbedder
+
+
+FAKE_ANSWER = (
+    "Thought: I now can give a great answer\n"
+    "Final Answer: Let's start with the easiest step. Unplug your EH222 for 30 seconds, "
+    "plug it back in and wait ten minutes for the first ice cycle. Did that help?"
+)
+
+
+class FakeLLM(BaseLLM):
+    """LLM stand-in with configurable latency and output token rate"""
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 200.0, response: str = FAKE_ANSWER):
+        super().__init__(model="fake-llm", temperature=0.0)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response = response
+
+    def _start(self, messages, from_task, from_agent) -> float:
+        """Emit the start event and track token usage; returns the simulated response time"""
+        self._emit_call_started_event(messages=messages, from_task=from_task, from_agent=from_agent)
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in self._format_messages(messages))
+        completion_tokens = len(self.response.split())
+        self._track_token_usage_internal({
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        })
+        delay = self.latency
+        if self.tokens_per_second > 0:
+            delay += completion_tokens / self.tokens_per_second
+        return delay
+
+    def _finish(self, messages, from_task, from_agent) -> str:
+        self._emit_call_completed_event(
+            response=self.response,
+            call_type=LLMCallType.LLM_CALL,
+            from_task=from_task,
+            from_agent=from_agent,
+            messages=messages,
+        )
+        return self.response
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        time.sleep(self._start(messages, from_task, from_agent))
+        return self._finish(messages, from_task, from_agent)
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        await asyncio.sleep(self._start(messages, from_task, from_agent))
+        return self._finish(messages, from_task, from_agent)
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+
+def build_rag_service() -> RAGService:
+    """In-process Qdrant collection seeded with the sample solutions"""
+    embedder = LocalHashEmbedder()
+    service = RAGService(qdrant_url=":memory:", collection_name="loadtest_solutions", embedder=embedder)
+    service.client.create_collection(
+        collection_name=service.collection_name,
+        vectors_config=VectorParams(size=embedder.dimensions, distance=Distance.COSINE),
+    )
+    service.add_sample_solutions()
+    return service
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(pct / 100.0 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def summarize(samples: List[float]) -> dict:
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples) if samples else 0.0,
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples) if samples else 0.0,
+    }
+
+
+class SampleCollector:
+    """Collects raw histogram observations grouped by a label"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def observer(self, prefix: str, label: str):
+        def record(value: float, labels: dict):
+            self.samples.setdefault(f"{prefix}:{labels[label]}", []).append(value)
+        return record
+
+
+async def sample_concurrency(peaks: Dict[str, float], interval: float = 0.01):
+    """Record peak OS threads, busy worker threads and in-flight async crews until cancelled"""
+    while True:
+        for name, value in (
+            ("threads", threading.active_count()),
+            ("busy_worker_threads", EXECUTOR_ACTIVE.value()),
+            ("async_crews", ASYNC_CREWS_ACTIVE.value()),
+        ):
+            peaks[name] = max(peaks.get(name, 0), value)
+        await asyncio.sleep(interval)
+
+
+async def drive(num_requests: int, concurrency: int, identical: bool) -> dict:
+    """Send /process-issue requests with bounded concurrency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    peaks: Dict[str, float] = {}
+
+    transport = httpx.ASGITransport(app=crewai_api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        async def one(i: int):
+            message = "My EH222 is not making ice" if identical else f"My EH222 is not making ice (session {i})"
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/process-issue", json={"user_message": message})
+                    if response.status_code != 200:
+                        errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                        return
+                except Exception as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        sampler = asyncio.create_task(sample_concurrency(peaks))
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(num_requests)))
+        duration = time.perf_counter() - start
+        sampler.cancel()
+
+    return {"latencies": latencies, "errors": errors, "duration": duration, "peaks": peaks}
+
+
+async def run_load_test(args, mode: str = None) -> dict:
+    agents.set_llm_factory(lambda agent=None, stream=False: FakeLLM(latency=args.llm_latency, tokens_per_second=args.tokens_per_second))
+    crewai_api.rag_service = build_rag_service()
+    original_mode, original_executor = crewai_api.CREW_EXECUTION_MODE, crewai_api.executor
+    if mode:
+        crewai_api.CREW_EXECUTION_MODE = mode
+    if args.workers:
+        crewai_api.executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="crew-worker")
+    mode, workers = crewai_api.CREW_EXECUTION_MODE, crewai_api.executor._max_workers
+    # Each run warms up again (see --mode compare): wait for its own warm-up, not the previous run's
+    crewai_api.warmup_status.update(ready=False, steps={}, error=None)
+
+    collector = SampleCollector()
+    observers = [
+        (STAGE_LATENCY, collector.observer("stage", "stage")),
+        (LLM_LATENCY, collector.observer("llm", "agent_role")),
+        (RAG_EMBED_LATENCY, collector.observer("rag_embed", "model")),
+        (RAG_SEARCH_LATENCY, collector.observer("rag_search", "collection")),
+    ]
+    for histogram, callback in observers:
+        histogram.add_observer(callback)
+
+    try:
+        async with crewai_api.app.router.lifespan_context(crewai_api.app):
+            await crewai_api._warmup_task
+            # Report only the load phase, not warm-up
+            collector.samples.clear()
+            outcome = await drive(args.requests, args.concurrency, args.identical)
+    finally:
+        for histogram, callback in observers:
+            histogram.remove_observer(callback)
+        agents.set_llm_factory(None)
+        if crewai_api.executor is not original_executor:
+            # Its idle threads would count towards the thread peak of the next run
+            crewai_api.executor.shutdown(wait=True)
+        crewai_api.CREW_EXECUTION_MODE, crewai_api.executor = original_mode, original_executor
+
+    completed = len(outcome["latencies"])
+    return {
+        "config": {
+            "mode": mode,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "identical": args.identical,
+            "workers": workers,
+        },
+        "completed": completed,
+        "errors": outcome["errors"],
+        "duration_s": outcome["duration"],
+        "rps": completed / outcome["duration"] if outcome["duration"] else 0.0,
+        "peak": outcome["peaks"],
+        "latency_s": {
+            "request": summarize(outcome["latencies"]),
+            **{name: summarize(samples) for name, samples in sorted(collector.samples.items())},
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the CrewAI API")
+    parser.add_argument("--requests", type=int, default=20, help="Total /process-issue requests")
+    parser.add_argument("--concurrency", type=int, default=5, help="Requests in flight at once")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake LLM output token rate")
+    parser.add_argument("--identical", action="store_true", help="Send the same message every time")
+    parser.add_argument("--mode", choices=["thread", "async", "compare"],
+                        help="Crew execution mode (default: CREW_EXECUTION_MODE); compare runs both")
+    parser.add_argument("--workers", type=int, help="Worker threads of the API (default: CREWAI_API_WORKERS)")
+    parser.add_argument("--output", help="Write the JSON report to this file as well")
+    parser.add_argument("--verbose", action="store_true", help="Show crew and service output")
+    args = parser.parse_args()
+
+    modes = ["async", "thread"] if args.mode == "compare" else [args.mode]
+    reports = {}
+    for mode in modes:
+        if args.verbose:
+            reports[mode] = asyncio.run(run_load_test(args, mode))
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                reports[mode] = asyncio.run(run_load_test(args, mode))
+    report = reports if args.mode == "compare" else reports[args.mode]
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0 if not any(r["errors"] for r in reports.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Rolling conversation memory for the staged support conversation
+Keeps the last turns verbatim and folds older turns into an incrementally
+updated summary, so the prompt context stays under a token ceiling however
+long the conversation gets
+"""
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from config import config
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable offline
+    _ENCODING = None
+
+SummarizeFn = Callable[[str, List["Turn"]], str]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def count_tokens(text: str) -> int:
+    """Token count of a text (approximated as 4 characters per token without tiktoken)"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """
+    Cut a text to at most max_tokens tokens
+
+    Args:
+        text: Text to cut
+        max_tokens: Token budget
+        keep_end: Keep the end of the text instead of the beginning
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        tokens = tokens[-max_tokens:] if keep_end else tokens[:max_tokens]
+        return _ENCODING.decode(tokens)
+    chars = max_tokens * 4
+    return text[-chars:] if keep_end else text[:chars]
+
+
+@dataclass
+class Turn:
+    """One user message and the agent's reply"""
+    user: str
+    agent: str
+
+    def render(self) -> str:
+        return f"User: {self.user}\nAgent: {self.agent}"
+
+
+def _lead(text: str, max_tokens: int, min_words: int = 8) -> str:
+    """Leading sentences of a text, enough for min_words words, within max_tokens"""
+    text = " ".join(text.split())
+    sentences = []
+    for sentence in _SENTENCE_END.split(text):
+        sentences.append(sentence)
+        if sum(len(s.split()) for s in sentences) >= min_words:
+            break
+    clipped = truncate_to_tokens(" ".join(sentences), max_tokens)
+    return clipped if clipped == text else clipped.rstrip() + "…"
+
+
+def extractive_summarizer(max_tokens_per_turn: int = 40) -> SummarizeFn:
+    """
+    Summarizer that needs no LLM call: appends one line per folded turn,
+    built from the leading sentences of the user message and of the reply
+    """
+    def summarize(summary: str, turns: List[Turn]) -> str:
+        lines = [summary] if summary else []
+        for turn in turns:
+            lines.append(
+                f"- User: {_lead(turn.user, max_tokens_per_turn)} "
+                f"| Agent: {_lead(turn.agent, max_tokens_per_turn)}"
+            )
+        return "\n".join(lines)
+
+    return summarize
+
+
+SUMMARY_PROMPT = """Update the running summary of a device support conversation.
+Keep the device, the symptoms reported, the troubleshooting steps already tried and their outcome.
+Be brief and factual; answer with the updated summary only.
+
+Current summary:
+{summary}
+
+New conversation turns:
+{turns}"""
+
+
+def llm_summarizer(llm) -> SummarizeFn:
+    """
+    Summarizer that asks an LLM to fold the turns into the running summary.
+    Falls back to the extractive summary if the call fails.
+    """
+    fallback = extractive_summarizer()
+
+    def summarize(summary: str, turns: List[Turn]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            summary=summary or "(empty)",
+            turns="\n".join(turn.render() for turn in turns),
+        )
+        try:
+            return str(llm.call([{"role": "user", "content": prompt}])).strip()
+        except Exception:
+            return fallback(summary, turns)
+
+    return summarize
+
+
+class ConversationMemory:
+    """Last turns verbatim plus a rolling summary of older turns, bounded by a token ceiling"""
+
+    def __init__(
+        self,
+        window_turns: int = 4,
+        max_tokens: int = 1500,
+        summarizer: Optional[SummarizeFn] = None,
+    ):
+        """
+        Initialize the conversation memory
+
+        Args:
+            window_turns: Number of most recent turns kept verbatim
+            max_tokens: Ceiling for the rendered context
+            summarizer: Function (summary, folded_turns) -> updated summary
+        """
+        self.window_turns = max(window_turns, 1)
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer or extractive_summarizer()
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self.total_turns = 0
+
+    def add_turn(self, user_message: str, agent_response: str):
+        """Record a turn, folding turns that leave the window into the summary"""
+        self.turns.append(Turn(user=user_message, agent=agent_response))
+        self.total_turns += 1
+        overflow = len(self.turns) - self.window_turns
+        if overflow > 0:
+            self._fold(overflow)
+        self._enforce_ceiling()
+
+    def _fold(self, count: int):
+        folded, self.turns = self.turns[:count], self.turns[count:]
+        self.summary = self.summarizer(self.summary, folded)
+
+    def _excess(self) -> int:
+        return count_tokens(self.render()) - self.max_tokens
+
+    def _trim_summary(self, max_tokens: int):
+        """Drop the oldest summary lines (or, for a single line, its start) to fit max_tokens"""
+        lines = self.summary.splitlines()
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+            lines.pop(0)
+        self.summary = truncate_to_tokens("\n".join(lines), max_tokens, keep_end=True)
+
+    def _enforce_ceiling(self):
+        # The summary may use up to a third of the ceiling so recent turns stay verbatim
+        self._trim_summary(self.max_tokens // 3)
+        # Fold more turns while the context does not fit, but always keep the latest one
+        while len(self.turns) > 1 and self._excess() > 0:
+            self._fold(1)
+        # Then shrink the summary further
+        if self.summary and self._excess() > 0:
+            self._trim_summary(count_tokens(self.summary) - self._excess())
+        # A single oversized turn keeps the start of its longer message
+        while self.turns and self._excess() > 0:
+            turn = self.turns[-1]
+            field_name = "agent" if count_tokens(turn.agent) >= count_tokens(turn.user) else "user"
+            text = getattr(turn, field_name)
+            if not text:
+                break
+            setattr(turn, field_name, truncate_to_tokens(text, count_tokens(text) - self._excess()))
+
+    def render(self) -> str:
+        """Context text for a prompt: summary of earlier turns, then the recent turns"""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.summary}")
+        if self.turns:
+            parts.append("\n".join(turn.render() for turn in self.turns))
+        return "\n\n".join(parts)
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
+        self.total_turns = 0
+
+    def __len__(self) -> int:
+        return self.total_turns
+
+
+def create_memory(stage: str) -> ConversationMemory:
+    """
+    Conversation memory configured for a stage (see MemoryConfig)
+
+    Args:
+        stage: "symptoms", "solving", or any other name for the default ceiling
+    """
+    settings = config.memory
+    summarizer = None
+    if settings.summarizer == "llm":
+        from agents import create_summary_llm
+        summarizer = llm_summarizer(create_summary_llm())
+    return ConversationMemory(
+        window_turns=settings.window_turns,
+        max_tokens=settings.stage_max_tokens.get(stage, settings.default_max_tokens),
+        summarizer=summarizer,
+    )
@@ -0,0 +1,424 @@
+"""
+Lightweight in-process metrics for the Device Support Service
+Renders counters, gauges and histograms in the Prometheus text exposition format
+"""
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Latency buckets in seconds - crew runs take seconds to minutes, embeds milliseconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    """Escape a label value for the exposition format"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Format label pairs as {a="x",b="y"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: List[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames or ())
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: List[str] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: List[str] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: List[str] = None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._observers = []
+
+    def add_observer(self, callback):
+        """Register callback(value, labels) to receive every raw observation (e.g. for benchmarks)"""
+        self._observers.append(callback)
+
+    def remove_observer(self, callback):
+        self._observers.remove(callback)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        for callback in self._observers:
+            callback(value, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * len(self.buckets) + [0.0, 0]
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the wrapped block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[-1] if state else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            for i, bound in enumerate(self.buckets):
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {state[i]}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as {existing.type_name}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: List[str] = None) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: List[str] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: List[str] = None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Global registry instance
+registry = MetricsRegistry()
+
+# API
+REQUEST_COUNT = registry.counter(
+    "crewai_api_requests_total", "HTTP requests handled by the API", ["endpoint", "method", "status"]
+)
+REQUEST_LATENCY = registry.histogram(
+    "crewai_api_request_duration_seconds", "HTTP request latency per endpoint", ["endpoint"]
+)
+STAGE_LATENCY = registry.histogram(
+    "crewai_api_stage_duration_seconds", "Latency of each processing stage of a device issue", ["stage"]
+)
+ERROR_COUNT = registry.counter(
+    "crewai_api_errors_total", "Errors raised while handling requests, by exception type", ["where", "type"]
+)
+EXECUTOR_QUEUED = registry.gauge(
+    "crewai_api_executor_queue_depth", "Crew runs waiting for a worker thread"
+)
+EXECUTOR_ACTIVE = registry.gauge(
+    "crewai_api_executor_active", "Crew runs currently executing on a worker thread"
+)
+ASYNC_CREWS_ACTIVE = registry.gauge(
+    "crewai_api_async_crews_active", "Crew runs currently executing natively async on the event loop"
+)
+WEBSOCKET_CONNECTIONS = registry.gauge(
+    "crewai_api_websocket_connections", "Open /ws/chat connections"
+)
+API_READY = registry.gauge(
+    "crewai_api_ready", "1 once warm-up has completed and the API accepts traffic"
+)
+
+# LLM
+LLM_CALLS = registry.counter(
+    "crewai_llm_calls_total", "LLM calls per agent role and outcome", ["agent_role", "model", "outcome"]
+)
+LLM_LATENCY = registry.histogram(
+    "crewai_llm_call_duration_seconds", "LLM call latency per agent role", ["agent_role", "model"]
+)
+AGENT_TRUNCATIONS = registry.counter(
+    "crewai_agent_truncations_total",
+    "Agent outputs cut short by a generation limit (max_tokens, max_iter, max_execution_time)",
+    ["agent_role", "limit"],
+)
+LLM_TOKENS = registry.counter(
+    "crewai_llm_tokens_total", "LLM tokens consumed per agent role", ["agent_role", "kind"]
+)
+TOKEN_BUCKETS = (0, 128, 256, 512, 1024, 1536, 2048, 4096, 8192, 16384)
+LLM_PROMPT_TOKENS_PER_CALL = registry.histogram(
+    "crewai_llm_prompt_tokens_per_call", "Prompt tokens sent per LLM call", ["agent_role"], TOKEN_BUCKETS
+)
+LLM_CACHED_PROMPT_TOKENS_PER_CALL = registry.histogram(
+    "crewai_llm_cached_prompt_tokens_per_call",
+    "Prompt tokens served from the provider's prefix cache per LLM call",
+    ["agent_role"],
+    TOKEN_BUCKETS,
+)
+
+# RAG
+RAG_EMBED_LATENCY = registry.histogram(
+    "rag_embed_duration_seconds", "Latency of embedding calls", ["model"]
+)
+RAG_SEARCH_LATENCY = registry.histogram(
+    "rag_search_duration_seconds", "Latency of vector searches", ["collection"]
+)
+
+
+_llm_call_starts: Dict[str, float] = {}
+_llm_call_starts_lock = threading.Lock()
+# Last seen cumulative token usage per LLM object, to derive per-call usage
+_llm_usage_seen: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+# Agent role per LLM object (each agent has its own), for calls made without the agent
+_llm_roles: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_listeners_installed = False
+
+
+def _llm_call_key(source, event) -> str:
+    return event.agent_id or str(id(source))
+
+
+def install_crewai_listeners():
+    """
+    Subscribe to CrewAI LLM events to record call counts and latency per agent role.
+    Safe to call more than once.
+    """
+    global _listeners_installed
+    if _listeners_installed:
+        return
+
+    from crewai.events import crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent
+    from crewai.events.types.agent_events import AgentExecutionErrorEvent
+    from crewai.utilities.i18n import I18N
+
+    # Prompt CrewAI appends when an agent used up max_iter and must answer now
+    force_final_answer = I18N().errors("force_final_answer")
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def _on_llm_started(source, event):
+        with _llm_call_starts_lock:
+            _llm_call_starts[_llm_call_key(source, event)] = event.timestamp.timestamp()
+            try:
+                if event.agent_role:
+                    _llm_roles[source] = event.agent_role
+                role = event.agent_role or _llm_roles.get(source)
+            except TypeError:  # not weak-referenceable
+                role = event.agent_role
+        messages = event.messages
+        last = messages[-1].get("content") if isinstance(messages, list) and messages else messages
+        if isinstance(last, str) and force_final_answer in last:
+            # The forced final answer is requested without the agent
+            AGENT_TRUNCATIONS.inc(agent_role=role or "unknown", limit="max_iter")
+
+    def _finish(source, event, outcome: str):
+        with _llm_call_starts_lock:
+            started = _llm_call_starts.pop(_llm_call_key(source, event), None)
+        role = event.agent_role or "unknown"
+        model = getattr(event, "model", None) or getattr(source, "model", None) or "unknown"
+        LLM_CALLS.inc(agent_role=role, model=model, outcome=outcome)
+        if started is not None:
+            LLM_LATENCY.observe(max(event.timestamp.timestamp() - started, 0.0), agent_role=role, model=model)
+
+    def _record_call_tokens(source, event):
+        usage = getattr(source, "_token_usage", None)
+        if not isinstance(usage, dict):
+            return
+        try:
+            with _llm_call_starts_lock:
+                seen = _llm_usage_seen.get(source, {})
+                _llm_usage_seen[source] = dict(usage)
+        except TypeError:  # not weak-referenceable
+            return
+        prompt = usage.get("prompt_tokens", 0) - seen.get("prompt_tokens", 0)
+        cached = usage.get("cached_prompt_tokens", 0) - seen.get("cached_prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0) - seen.get("completion_tokens", 0)
+        role = event.agent_role or "unknown"
+        # The provider's finish reason where available (see llm_pool), else the token count
+        finish_reason = getattr(source, "last_finish_reason", None)
+        if finish_reason is not None:
+            source.last_finish_reason = None
+            truncated = finish_reason == "length"
+        else:
+            max_tokens = getattr(source, "max_tokens", None)
+            truncated = isinstance(max_tokens, int) and max_tokens > 0 and completion >= max_tokens
+        if truncated:
+            AGENT_TRUNCATIONS.inc(agent_role=role, limit="max_tokens")
+        if prompt <= 0:
+            return
+        LLM_PROMPT_TOKENS_PER_CALL.observe(prompt, agent_role=role)
+        LLM_CACHED_PROMPT_TOKENS_PER_CALL.observe(max(cached, 0), agent_role=role)
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def _on_llm_completed(source, event):
+        _finish(source, event, "success")
+        _record_call_tokens(source, event)
+
+    @crewai_event_bus.on(LLMCallFailedEvent)
+    def _on_llm_failed(source, event):
+        _finish(source, event, "error")
+
+    @crewai_event_bus.on(AgentExecutionErrorEvent)
+    def _on_agent_error(source, event):
+        if "timed out" in event.error:
+            AGENT_TRUNCATIONS.inc(agent_role=getattr(event.agent, "role", None) or "unknown", limit="max_execution_time")
+
+    _listeners_installed = True
+
+
+_TOKEN_KINDS = (("prompt", "prompt_tokens"), ("completion", "completion_tokens"),
+                ("cached_prompt", "cached_prompt_tokens"))
+
+
+def token_usage_snapshot(agents: list) -> dict:
+    """
+    Token usage each agent's LLM has accumulated so far, to pass as `since` to
+    record_agent_token_usage for agents that outlive a single crew run.
+
+    Args:
+        agents: Agents of the crew about to run
+
+    Returns:
+        The usage counts by agent id
+    """
+    snapshot = {}
+    for agent in agents:
+        llm = getattr(agent, "llm", None)
+        if llm is not None and hasattr(llm, "get_token_usage_summary"):
+            usage = llm.get_token_usage_summary()
+            snapshot[id(agent)] = {kind: getattr(usage, field) for kind, field in _TOKEN_KINDS}
+    return snapshot
+
+
+def record_agent_token_usage(agents: list, since: dict = None):
+    """
+    Record token usage accumulated by each agent's LLM during a crew run.
+
+    Args:
+        agents: Agents whose LLM instances were used for this run
+        since: Snapshot taken before the run (see token_usage_snapshot); without it
+            the agents' whole usage is recorded, so they must have been used for exactly this run
+    """
+    for agent in agents:
+        llm = getattr(agent, "llm", None)
+        if llm is None or not hasattr(llm, "get_token_usage_summary"):
+            continue
+        usage = llm.get_token_usage_summary()
+        before = (since or {}).get(id(agent), {})
+        role = agent.role
+        for kind, field in _TOKEN_KINDS:
+            tokens = max(getattr(usage, field) - before.get(kind, 0), 0)
+            if tokens or kind != "cached_prompt":
+                LLM_TOKENS.inc(tokens, agent_role=role, kind=kind)
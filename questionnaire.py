@@ -0,0 +1,150 @@
+"""
+Symptom questionnaire for the staged support conversation
+Serves the fixed symptom questions one at a time without an LLM call and keeps
+the answers in named slots; only the final summary needs the LLM
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Question:
+    """One questionnaire step: the slot its answer fills, a label for summaries, the question text"""
+    slot: str
+    label: str
+    text: str
+
+
+SYMPTOM_QUESTIONS: Tuple[Question, ...] = (
+    Question("symptoms", "Symptoms / error messages",
+             "Could you tell me more about the specific symptoms or error messages you are seeing?"),
+    Question("onset", "First noticed",
+             "When did you first notice this problem?"),
+    Question("trigger", "Triggers",
+             "Are there any specific actions that seem to trigger this problem or make it worse or better?"),
+    Question("recent_change", "Recent changes",
+             "Have there been any recent changes to your device, such as software updates or physical modifications?"),
+    Question("sequence", "Sequence of events",
+             "Could you walk me through the exact sequence of events leading up to when the problem occurs?"),
+    Question("intermittency", "Intermittent or constant",
+             "Is this issue intermittent, or does it happen constantly?"),
+    Question("other", "Other details",
+             "Are there any other details you think might be relevant to diagnosing this problem?"),
+)
+
+# Short acknowledgements put in front of the next question, rotated so replies do not repeat
+ACKNOWLEDGEMENTS = ("Thanks, that helps.", "Got it.", "Understood, thank you.", "Thanks for the details.")
+
+# Function (user message) -> {slot: answer} for questions the message already answers
+Extractor = Callable[[str], Dict[str, str]]
+
+
+class SymptomQuestionnaire:
+    """Walks through SYMPTOM_QUESTIONS in order, recording each answer in its slot"""
+
+    def __init__(self, questions: Tuple[Question, ...] = SYMPTOM_QUESTIONS, extractor: Optional[Extractor] = None):
+        """
+        Initialize the questionnaire
+
+        Args:
+            questions: Questions in the order they are asked
+            extractor: Optional slot extractor run on every message; questions whose
+                slot it fills are skipped
+        """
+        self.questions = questions
+        self.extractor = extractor
+        self.initial_report = ""
+        self.answers: Dict[str, str] = {}
+        # Slots filled by the extractor rather than by answering their question
+        self.extracted: List[str] = []
+        self.pending: Optional[Question] = None
+        self._history: List[Tuple[Optional[Question], str, List[str]]] = []
+
+    @property
+    def started(self) -> bool:
+        return bool(self._history)
+
+    @property
+    def answered(self) -> int:
+        return len(self.answers)
+
+    @property
+    def complete(self) -> bool:
+        return self.started and self.pending is None and self._next() is None
+
+    def _next(self) -> Optional[Question]:
+        for question in self.questions:
+            if question.slot not in self.answers:
+                return question
+        return None
+
+    def respond(self, user_message: str) -> Optional[str]:
+        """
+        Record a user message and get the next question
+
+        The first message is kept as the initial problem report, later ones answer
+        the question asked before them.
+
+        Args:
+            user_message: The user's message
+
+        Returns:
+            The next question (with a short acknowledgement), or None once all are answered
+        """
+        user_message = user_message.strip()
+        # Extract first: the questionnaire is unchanged if the extractor raises
+        extracted = self.extractor(user_message) if self.extractor and user_message else {}
+        if self.pending is None and not self._history:
+            self.initial_report = user_message
+        elif self.pending is not None:
+            self.answers[self.pending.slot] = user_message
+
+        filled = []
+        slots = {question.slot for question in self.questions}
+        for slot, value in extracted.items():
+            if slot in slots and slot not in self.answers:
+                self.answers[slot] = value
+                filled.append(slot)
+        self.extracted.extend(filled)
+        self._history.append((self.pending, user_message, filled))
+
+        self.pending = self._next()
+        if self.pending is None:
+            return None
+        if len(self._history) == 1 and not filled:
+            return self.pending.text
+        acknowledgement = ACKNOWLEDGEMENTS[(len(self._history) - 2) % len(ACKNOWLEDGEMENTS)] \
+            if not filled else "Thanks, I have noted those details."
+        return f"{acknowledgement} {self.pending.text}"
+
+    def retract(self):
+        """Undo the last respond(), e.g. when the turn it belonged to was cancelled"""
+        if not self._history:
+            return
+        question, _, filled = self._history.pop()
+        for slot in filled:
+            self.answers.pop(slot, None)
+            self.extracted.remove(slot)
+        if question is not None:
+            self.answers.pop(question.slot, None)
+        elif not self._history:
+            self.initial_report = ""
+        self.pending = question
+
+    def render(self) -> str:
+        """The initial report and the answers, one labelled line each"""
+        lines = []
+        if self.initial_report:
+            lines.append(f"- Initial report: {self.initial_report}")
+        for question in self.questions:
+            if question.slot in self.answers:
+                lines.append(f"- {question.label}: {self.answers[question.slot]}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "initial_report": self.initial_report,
+            "answers": dict(self.answers),
+            "extracted": list(self.extracted),
+            "pending": self.pending.slot if self.pending else None,
+        }
@@ -0,0 +1,100 @@
+"""
+Background knowledge base retrieval for a support session
+Searches start as soon as the device is confirmed and are refreshed as symptom
+answers arrive; the problem solver takes the latest finished results and never
+waits for a search
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from config import config
+from metrics import registry
+
+RAG_PREFETCHES = registry.counter(
+    "crewai_rag_prefetch_total",
+    "Background knowledge base searches and how the solver found them (searched, failed, hit, miss)",
+    ["result"],
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=config.rag_prefetch.max_workers, thread_name_prefix="rag-prefetch"
+            )
+        return _executor
+
+
+class RetrievalPrefetcher:
+    """Runs at most one search at a time per session; newer requests replace queued ones"""
+
+    def __init__(self, search):
+        """
+        Initialize the prefetcher
+
+        Args:
+            search: Function (query, device_type, error_code) -> solutions, run in the background
+        """
+        self.search = search
+        self._lock = threading.Lock()
+        self._running = False
+        self._queued: Optional[Tuple[int, tuple]] = None
+        self._version = 0
+        self._results: Optional[List[dict]] = None
+        self._results_version = 0
+        self._closed = False
+
+    def refresh(self, query: str, device_type: str = None, error_code: str = None):
+        """Request a search for the current state of the conversation (returns immediately)"""
+        with self._lock:
+            if self._closed:
+                return
+            self._version += 1
+            request = (self._version, (query, device_type, error_code))
+            if self._running:
+                self._queued = request
+                return
+            self._running = True
+        _get_executor().submit(self._run, request)
+
+    def _run(self, request):
+        while request is not None:
+            version, args = request
+            try:
+                results = self.search(*args)
+                RAG_PREFETCHES.inc(result="searched")
+            except Exception as e:
+                print(f"RAG prefetch failed: {e}")
+                RAG_PREFETCHES.inc(result="failed")
+                results = None
+            with self._lock:
+                if results is not None and version > self._results_version:
+                    self._results, self._results_version = results, version
+                request, self._queued = self._queued, None
+                if request is None or self._closed:
+                    self._running = False
+                    return
+
+    def latest(self) -> Optional[List[dict]]:
+        """Results of the most recent finished search, None if none has finished yet"""
+        with self._lock:
+            results = self._results
+        RAG_PREFETCHES.inc(result="hit" if results is not None else "miss")
+        return results
+
+    @property
+    def stale(self) -> bool:
+        """Whether a newer search than the available results was requested"""
+        with self._lock:
+            return self._results_version < self._version
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._queued = None
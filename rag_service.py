@@ -2,12 +2,17 @@
 RAG Service for Problem-Solving using Qdrant Vector Database
 """
 import os
+import re
 import sys
+import math
+import zlib
 from dotenv import load_dotenv
 from typing import List
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
 from voyageai import Client as VoyageClient
+from metrics import RAG_EMBED_LATENCY, RAG_SEARCH_LATENCY
+from singleflight import SingleFlight
 
 # Fix Windows encoding issues (only for non-Streamlit environments)
 if sys.platform == "win32" and hasattr(sys.stdout, 'buffer'):
@@ -23,17 +28,45 @@ if sys.platform == "win32" and hasattr(sys.stdout, 'buffer'):
 load_dotenv()
 
 
+class LocalHashEmbedder:
+    """
+    Deterministic offline stand-in for the Voyage embedding API.
+    Hashes word unigrams and bigrams into a fixed-size, L2-normalized vector,
+    so similar texts still land close together without any network calls.
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+        self.model = f"local-hash-{dimensions}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # Use one hash bit as the sign to reduce collision bias
+            vector[digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+
 class RAGService:
     """Service for managing and querying solutions from Qdrant"""
 
-    def __init__(self, qdrant_url: str = "http://localhost:6333", collection_name: str = "device_solutions", api_key: str = None):
+    def __init__(self, qdrant_url: str = "http://localhost:6333", collection_name: str = "device_solutions", api_key: str = None, embedder=None):
         """
         Initialize RAG Service
         
         Args:
-            qdrant_url: URL to Qdrant server
+            qdrant_url: URL to Qdrant server, or ":memory:" for an in-process instance
             collection_name: Name of the collection in Qdrant
             api_key: Optional API key for Qdrant cloud
+            embedder: Optional embedder with embed(texts), model and dimensions
+                      (defaults to Voyage AI, or LocalHashEmbedder if EMBEDDING_PROVIDER=local)
         """
         # Clean up inputs (strip whitespace)
         qdrant_url = qdrant_url.strip() if qdrant_url else qdrant_url
@@ -53,7 +86,9 @@ class RAGService:
             print(f"  Collection: {coll_safe}")
             print(f"  API Key: {key_display}")
             
-            if api_key:
+            if qdrant_url == ":memory:":
+                self.client = QdrantClient(location=":memory:")
+            elif api_key:
                 self.client = QdrantClient(
                     url=qdrant_url,
                     api_key=api_key,
@@ -74,9 +109,21 @@ class RAGService:
             raise ConnectionError(f"Failed to connect to Qdrant: {str(e)}")
         
         self.collection_name = collection_name
-        self.voyage_client = VoyageClient(api_key=os.getenv("VOYAGE_API_KEY"))
-        self.model = "voyage-3-large"
-        self.vector_size = 1024  # Voyage AI 3 Large embedding size
+        if embedder is None and os.getenv("EMBEDDING_PROVIDER", "voyage").lower() == "local":
+            embedder = LocalHashEmbedder()
+        self.embedder = embedder
+        if embedder is not None:
+            self.voyage_client = None
+            self.model = embedder.model
+            self.vector_size = embedder.dimensions
+        else:
+            self.voyage_client = VoyageClient(api_key=os.getenv("VOYAGE_API_KEY"))
+            self.model = "voyage-3-large"
+            self.vector_size = 1024  # Voyage AI 3 Large embedding size
+        
+        # Coalesce identical concurrent embed/search calls into one upstream request
+        self._embed_flight = SingleFlight("rag_embed")
+        self._search_flight = SingleFlight("rag_search")
         
         # Initialize collection if it doesn't exist
         self._initialize_collection()
@@ -90,7 +137,25 @@ class RAGService:
             print(f"⚠ Warning: Collection '{self.collection_name}' check failed: {e}")
             print("  The collection may not exist or may be inaccessible")
 
-    def add_solution(self, device_type: str, problem: str, solution: str, manual_reference: str = None):
+    def embed(self, text: str) -> List[float]:
+        """
+        Create an embedding for a single text
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding vector
+        """
+        return self._embed_flight.do((self.model, text), self._embed, text)
+
+    def _embed(self, text: str) -> List[float]:
+        with RAG_EMBED_LATENCY.time(model=self.model):
+            if self.embedder is not None:
+                return self.embedder.embed([text])[0]
+            return self.voyage_client.embed([text], model=self.model).embeddings[0]
+
+    def add_solution(self, device_type: str, problem: str, solution: str, manual_reference: str = None, error_code: str = None):
         """
         Add a solution to the knowledge base
         
@@ -99,10 +164,11 @@ class RAGService:
             problem: Problem description
             solution: Solution/fix description
             manual_reference: Reference to manual or documentation
+            error_code: Error code the solution applies to, if any
         """
         # Create embedding for the problem
         text = f"{device_type}: {problem}"
-        embedding = self.voyage_client.embed([text], model=self.model).embeddings[0]
+        embedding = self.embed(text)
         
         # Create document ID
         doc_id = hash(text) % (10 ** 8)
@@ -114,6 +180,8 @@ class RAGService:
             "solution": solution,
             "manual_reference": manual_reference or "",
         }
+        if error_code:
+            metadata["error_code"] = error_code.upper()
         
         # Add to Qdrant
         point = PointStruct(
@@ -128,7 +196,7 @@ class RAGService:
         )
         print(f"Added solution for {device_type}: {problem}")
 
-    def search_solutions(self, device_type: str, problem_description: str, limit: int = 3) -> List[dict]:
+    def search_solutions(self, device_type: str, problem_description: str, limit: int = 3, device_filter: bool = False, filters: dict = None) -> List[dict]:
         """
         Search for similar solutions in the knowledge base
         
@@ -136,20 +204,55 @@ class RAGService:
             device_type: Type of device
             problem_description: Detailed problem description
             limit: Number of results to return
+            device_filter: Only return solutions stored for exactly this device type
+            filters: Further payload values solutions must match, e.g. {"error_code": "E5"}
             
         Returns:
             List of relevant solutions
         """
+        return self._search_flight.do(
+            (device_type, problem_description, limit, device_filter, tuple(sorted((filters or {}).items()))),
+            self._search_solutions,
+            device_type,
+            problem_description,
+            limit,
+            device_filter,
+            filters,
+        )
+
+    def _search_solutions(self, device_type: str, problem_description: str, limit: int, device_filter: bool = False, filters: dict = None) -> List[dict]:
         # Create embedding for the search query
         text = f"{device_type}: {problem_description}"
-        query_embedding = self.voyage_client.embed([text], model=self.model).embeddings[0]
+        query_embedding = self.embed(text)
+        return self.search_by_vector(query_embedding, device_type, limit, device_filter, filters)
+
+    def search_by_vector(self, query_embedding: List[float], device_type: str = None, limit: int = 3, device_filter: bool = False, filters: dict = None) -> List[dict]:
+        """
+        Search the knowledge base with an embedding computed beforehand (see retrieval_state.py)
+        
+        Args:
+            query_embedding: Query vector of the collection's embedding model
+            device_type: Type of device, used with device_filter
+            limit: Number of results to return
+            device_filter: Only return solutions stored for exactly this device type
+            filters: Further payload values solutions must match, e.g. {"error_code": "E5"}
+            
+        Returns:
+            List of relevant solutions
+        """
+        must = dict(filters or {})
+        if device_filter and device_type:
+            must["device_type"] = device_type
+        conditions = [FieldCondition(key=key, match=MatchValue(value=value)) for key, value in must.items()]
         
         # Search in Qdrant
-        search_results = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_embedding,
-            limit=limit,
-        )
+        with RAG_SEARCH_LATENCY.time(collection=self.collection_name):
+            search_results = self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_embedding,
+                query_filter=Filter(must=conditions) if conditions else None,
+                limit=limit,
+            ).points
         
         # Extract and format results
         solutions = []
@@ -160,6 +263,7 @@ class RAGService:
                 "problem": result.payload.get("problem"),
                 "solution": result.payload.get("solution"),
                 "manual_reference": result.payload.get("manual_reference"),
+                "error_code": result.payload.get("error_code"),
             })
         
         return solutions
@@ -0,0 +1,168 @@
+"""
+Incremental retrieval state of a support session
+Each user turn is embedded once and folded into a decayed running query vector,
+together with weighted key terms, so knowledge base searches cost one embedding
+per turn however long the session gets (instead of embedding the whole history)
+"""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+from tasks import search_solutions_for
+
+_TERM = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be been before being but by can could
+did do does doing don't for from get got had has have having he her here hi his how i if in
+into is it its just like me more my no not now of off on once only or other our out over
+please really same she should so some still than that the their them then there these they
+this to too tried try up us very was we were what when where which while who why will with
+would yes you your
+""".split())
+
+
+def key_terms(text: str) -> List[str]:
+    """Distinct content words of a message (stopwords dropped, codes like "e5" kept)"""
+    terms = []
+    for term in _TERM.findall(text.lower()):
+        if term in STOPWORDS or (len(term) < 3 and not any(c.isdigit() for c in term)):
+            continue
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+class RetrievalState:
+    """Running query vector and key terms of one session"""
+
+    def __init__(self, rag_service, decay: float = None, max_terms: int = None, term_boost: float = None):
+        """
+        Initialize the state
+
+        Args:
+            rag_service: RAG service whose embedding model and collection are used
+            decay: Weight older turns keep each time a new turn is added (0-1)
+            max_terms: Number of key terms kept
+            term_boost: Score added to a result containing all key terms
+        """
+        settings = config.retrieval_state
+        self.rag_service = rag_service
+        self.decay = settings.decay if decay is None else decay
+        self.max_terms = settings.max_terms if max_terms is None else max_terms
+        self.term_boost = settings.term_boost if term_boost is None else term_boost
+        self.turns = 0
+        self.embeddings = 0
+        self._vector: Optional[List[float]] = None
+        self._terms: Counter = Counter()
+        self._pending: List[str] = []
+        self._folded = 0
+        # Last embedding made for a search preview, reused when that text becomes a turn
+        self._preview: Optional[Tuple[str, List[float]]] = None
+        self._lock = threading.Lock()
+
+    def add_turn(self, text: str):
+        """Add a user turn; it is embedded with the next search, not here"""
+        text = text.strip()
+        if not text:
+            return
+        with self._lock:
+            self.turns += 1
+            self._pending.append(text)
+            for term in self._terms:
+                self._terms[term] *= self.decay
+            self._terms.update(key_terms(text))
+            self._terms = Counter(dict(self._terms.most_common(self.max_terms)))
+
+    @property
+    def terms(self) -> Dict[str, float]:
+        """Key terms of the session with their decayed weights"""
+        with self._lock:
+            return {term: round(weight, 3) for term, weight in self._terms.most_common()}
+
+    def _embed(self, text: str) -> List[float]:
+        # Called without the lock: the embedding is a network call
+        preview = self._preview
+        if preview is not None and preview[0] == text:
+            return preview[1]
+        embedding = self.rag_service.embed(text)
+        with self._lock:
+            self.embeddings += 1
+        return embedding
+
+    @staticmethod
+    def _fold(vector: Optional[List[float]], embedding: List[float], decay: float) -> List[float]:
+        if vector is None:
+            return list(embedding)
+        return [decay * v + e for v, e in zip(vector, embedding)]
+
+    def query_vector(self, latest_message: str = "") -> Optional[List[float]]:
+        """
+        The normalized running query vector
+
+        Args:
+            latest_message: A reply not added as a turn yet (e.g. of a turn still in progress);
+                it is folded in for this query only
+
+        Returns:
+            The vector, or None before the first turn
+        """
+        # Embed outside the lock so a slow embedding call doesn't block add_turn or other searches;
+        # turns a concurrent search folded meanwhile are skipped
+        with self._lock:
+            start, texts = self._folded, list(self._pending)
+        embeddings = [self._embed(text) for text in texts]
+        with self._lock:
+            for embedding in embeddings[self._folded - start:]:
+                self._vector = self._fold(self._vector, embedding, self.decay)
+                self._pending.pop(0)
+                self._folded += 1
+            vector = self._vector
+        latest_message = latest_message.strip()
+        if latest_message:
+            embedding = self._embed(latest_message)
+            with self._lock:
+                self._preview = (latest_message, embedding)
+            vector = self._fold(vector, embedding, self.decay)
+        if vector is None:
+            return None
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def search(self, device_type: str = None, error_code: str = None, limit: int = 3, latest_message: str = "") -> List[dict]:
+        """
+        Search the knowledge base with the running query vector, boosting results
+        that contain the key terms
+
+        Args:
+            device_type: Confirmed device id, if known
+            error_code: Error code the user reported, if any
+            limit: Number of results
+            latest_message: Reply folded in for this search only (see query_vector)
+        """
+        vector = self.query_vector(latest_message)
+        if vector is None:
+            return []
+        terms = self.terms
+        for term in key_terms(latest_message):
+            terms[term] = terms.get(term, 0.0) + 1.0
+        solutions = search_solutions_for(
+            self.rag_service, "", device_type, error_code,
+            limit=limit * 2 if terms else limit, query_vector=vector,
+        )
+        if not terms:
+            return solutions
+
+        total = sum(terms.values())
+        for solution in solutions:
+            text = f"{solution.get('problem') or ''} {solution.get('solution') or ''}".lower()
+            found = set(_TERM.findall(text))
+            matched = sum(weight for term, weight in terms.items() if term in found)
+            solution["score"] = (solution.get("score") or 0.0) + self.term_boost * matched / total
+        solutions.sort(key=lambda solution: solution["score"], reverse=True)
+        return solutions[:limit]
+
+    def to_dict(self) -> dict:
+        return {"turns": self.turns, "embeddings": self.embeddings, "terms": self.terms}
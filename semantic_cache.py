@@ -0,0 +1,201 @@
+"""
+Semantic response cache for first-turn and FAQ questions
+Looks up previous responses by embedding similarity of the normalized user message,
+among entries for the same devices and error code
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from device_matcher import matcher_for
+from metrics import registry
+from slot_extractor import extract_slots
+
+CACHE_LOOKUPS = registry.counter(
+    "semantic_cache_lookups_total", "Semantic cache lookups by stage and result", ["stage", "result"]
+)
+CACHE_ENTRIES = registry.gauge(
+    "semantic_cache_entries", "Entries currently held in the semantic cache"
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, collapse whitespace and strip surrounding punctuation"""
+    message = _WHITESPACE.sub(" ", message.strip().lower())
+    return _EDGE_PUNCTUATION.sub("", message)
+
+
+def message_scope(message: str, devices: Tuple[Tuple[str, str], ...] = ()) -> str:
+    """
+    Device ids and error code of a message, the part of the cache key that must match exactly
+
+    Args:
+        message: The user's message
+        devices: Device catalog, e.g. agents.device_catalog()
+
+    Returns:
+        E.g. "EH222|E5"; "|" for a message naming neither
+    """
+    found = []
+    if devices:
+        match = matcher_for(devices).match(message)
+        if match.device:
+            found = sorted([match.device, *match.alternatives])
+    return f"{'+'.join(found)}|{extract_slots(message).error_code or ''}"
+
+
+@dataclass
+class CacheEntry:
+    """A cached response and the embedding of the message that produced it"""
+    key: str
+    stage: str
+    scope: str
+    vector: np.ndarray
+    response: str
+    expires_at: float
+    hits: int = 0
+
+
+class SemanticCache:
+    """Size-bounded, TTL-aware nearest-neighbour cache of responses"""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]],
+        threshold: float = 0.92,
+        max_entries: int = 500,
+        ttl_seconds: float = 86400,
+        devices: Tuple[Tuple[str, str], ...] = (),
+    ):
+        """
+        Initialize the semantic cache
+
+        Args:
+            embed_fn: Function returning an embedding for a text
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum number of entries (least recently used are evicted)
+            ttl_seconds: Default lifetime of an entry
+            devices: Device catalog; messages only match entries for the same devices
+                (and error code), however similar they are otherwise
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.devices = tuple(devices)
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, message: str, stage: str) -> Tuple[str, str, str]:
+        """(exact key, scope, text to embed) of a message"""
+        scope = message_scope(message, self.devices)
+        text = f"{stage}: {normalize_message(message)}"
+        return f"{scope} {text}", scope, text
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _purge_expired(self, now: float):
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, message: str, stage: str) -> Optional[str]:
+        """
+        Find a cached response for a semantically similar message
+
+        Args:
+            message: The user's message
+            stage: Conversation stage the message belongs to
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        key, scope, text = self._key(message, stage)
+        now = time.time()
+
+        with self._lock:
+            self._purge_expired(now)
+            CACHE_ENTRIES.set(len(self._entries))
+            # Exact match on the normalized text needs no embedding call
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit(entry, stage)
+            candidates = [entry for entry in self._entries.values()
+                          if entry.stage == stage and entry.scope == scope]
+
+        if not candidates:
+            CACHE_LOOKUPS.inc(stage=stage, result="miss")
+            return None
+
+        query = self._embed(text)
+        matrix = np.stack([entry.vector for entry in candidates])
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+
+        if scores[best] < self.threshold:
+            CACHE_LOOKUPS.inc(stage=stage, result="miss")
+            return None
+
+        with self._lock:
+            entry = self._entries.get(candidates[best].key)
+            if entry is None or entry.expires_at <= time.time():
+                CACHE_LOOKUPS.inc(stage=stage, result="miss")
+                return None
+            return self._hit(entry, stage)
+
+    def _hit(self, entry: CacheEntry, stage: str) -> str:
+        # Caller holds the lock
+        entry.hits += 1
+        self._entries.move_to_end(entry.key)
+        CACHE_LOOKUPS.inc(stage=stage, result="hit")
+        return entry.response
+
+    def store(self, message: str, stage: str, response: str, ttl_seconds: float = None):
+        """
+        Store a response for a message
+
+        Args:
+            message: The user's message
+            stage: Conversation stage the message belongs to
+            response: Response to return for similar messages
+            ttl_seconds: Lifetime of this entry (defaults to the cache TTL)
+        """
+        key, scope, text = self._key(message, stage)
+        vector = self._embed(text)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+
+        with self._lock:
+            self._entries[key] = CacheEntry(
+                key=key,
+                stage=stage,
+                scope=scope,
+                vector=vector,
+                response=response,
+                expires_at=time.time() + ttl,
+            )
+            self._entries.move_to_end(key)
+            self._purge_expired(time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            CACHE_ENTRIES.set(len(self._entries))
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            CACHE_ENTRIES.set(0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
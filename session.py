@@ -0,0 +1,551 @@
+"""
+Conversation session for the staged device support workflow
+Keeps stage, histories and the agents of one conversation (e.g. one WebSocket connection)
+so they are not rebuilt or re-sent on every turn
+"""
+import threading
+import uuid
+from typing import Callable, Dict, Optional
+
+from crewai import Crew
+from cancellation import CancelToken, OperationCancelled, bind_crew
+from config import config
+from memory import create_memory
+from metrics import record_agent_token_usage, token_usage_snapshot
+from device_matcher import identify_device, matcher_for, parse_confirmation, record_outcome
+from questionnaire import SymptomQuestionnaire
+from slot_extractor import SymptomSlots, extract_slots, llm_extract_slots
+from intent import INTENT_NOT_SOLVED, INTENT_OFF_TOPIC, INTENT_SOLVED, agent_reports_resolution, get_classifier, log_reply
+from speculation import Speculation, SpeculationBudget
+from rag_prefetch import RetrievalPrefetcher
+from retrieval_state import RetrievalState
+from agents import create_device_agent, create_symptom_agent, create_problem_solver_agent, create_extraction_llm, create_rag_query_tool, device_catalog
+from tasks import create_device_identification_task, create_symptom_summary_task, create_problem_solver_task, search_solutions_for
+
+# Conversation stages: initial -> device_confirmed -> symptoms_gathered -> complete
+STAGE_INITIAL = "initial"
+STAGE_DEVICE_CONFIRMED = "device_confirmed"
+STAGE_SYMPTOMS_GATHERED = "symptoms_gathered"
+STAGE_COMPLETE = "complete"
+
+SOLVED_MESSAGE = """✅ **Excellent! Your issue is resolved!**
+
+Thank you for using Device Support Service. We're glad we could help get your device back to working order."""
+NOT_SOLVED_MESSAGE = "I understand. Happened anything when you tried?"
+COMPLETE_MESSAGE = "This support session is complete. Start a new session for another issue."
+# The reply a speculative run assumes
+FAILURE_REPORT = "I tried that step, but it did not solve the problem."
+OFF_TOPIC_MESSAGE = "I can only help with your {device} here. Did the last step solve the problem?"
+SYMPTOMS_COMPLETE_MESSAGE = "Thank you, I have everything I need. Reply when you are ready and we will start troubleshooting."
+DEVICE_CONFIRM_MESSAGE = "Great! So you have the {description}. Is that correct?"
+DEVICE_GUESS_MESSAGE = "Just to be sure: did you mean the {description}? Please answer yes or no."
+DEVICE_PROBLEM_MESSAGE = "Excellent! Now, what problem are you experiencing with your {device}?"
+# A first message with at least this many words besides the model number already describes the problem
+MIN_REPORT_WORDS = 4
+
+
+# Token listeners keyed by agent id, fed from CrewAI stream chunk events
+_token_listeners: Dict[str, Callable[[str], None]] = {}
+_token_listeners_lock = threading.Lock()
+_stream_listener_installed = False
+
+
+def install_stream_listener():
+    """Route CrewAI LLM stream chunks to the session owning the agent. Safe to call more than once."""
+    global _stream_listener_installed
+    if _stream_listener_installed:
+        return
+
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _on_stream_chunk(source, event):
+        if not event.agent_id or not event.chunk:
+            return
+        with _token_listeners_lock:
+            listener = _token_listeners.get(event.agent_id)
+        if listener:
+            listener(event.chunk)
+
+    _stream_listener_installed = True
+
+
+class SupportSession:
+    """State and agents of one device support conversation"""
+
+    def __init__(self, rag_service=None, stream: bool = False):
+        """
+        Initialize a support session
+
+        Args:
+            rag_service: Optional RAG service for knowledge base lookups
+            stream: Create agents with streaming LLMs so tokens can be pushed as they arrive
+        """
+        self.session_id = uuid.uuid4().hex
+        self.rag_service = rag_service
+
+        self.stage = STAGE_INITIAL
+        self.device_confirmed: Optional[str] = None
+        # Catalog id of the device (e.g. "EH222") once known, used to filter knowledge base searches
+        self.device_id: Optional[str] = None
+        # Device identified locally and awaiting the user's yes/no, with the message that named it
+        self.pending_device: Optional[str] = None
+        self._pending_report = ""
+        self.symptoms_gathered: Optional[str] = None
+        # Fixed symptom questions answered into slots; troubleshooting turns in a rolling memory
+        self.questionnaire = SymptomQuestionnaire(extractor=self._extract_slots)
+        # Symptom details found in the user's messages; questions they answer are skipped
+        self.symptom_slots = SymptomSlots()
+        self._llm_extraction_done = False
+        self.symptom_questions_count = 0
+        # Recent turns verbatim, older ones summarized, within a token ceiling per stage
+        self.solving_memory = create_memory("solving")
+        self.problem_solving_step = 0
+        self.awaiting_solution_confirmation = False
+        # Intent of the last troubleshooting reply (see intent.py)
+        self.last_intent: Optional[str] = None
+        # Next step generated in the background in case the current one fails
+        self._speculation: Optional[Speculation] = None
+        self._speculation_budget = SpeculationBudget(config.speculation.max_per_session)
+        self._speculative_agent = None
+        self._speculative_tool = None
+        # Knowledge base results searched in the background while the conversation goes on
+        self._retrieval: Optional[RetrievalPrefetcher] = None
+        # Running query vector of the user's turns, each embedded once
+        self.retrieval_state: Optional[RetrievalState] = None
+        if rag_service is not None and config.retrieval_state.enabled:
+            self.retrieval_state = RetrievalState(rag_service)
+        if rag_service is not None and config.rag_prefetch.enabled:
+            self._retrieval = RetrievalPrefetcher(self._search_knowledge_base)
+        self._cancel_token: Optional[CancelToken] = None
+
+        # Agents are bound to the session and reused for every turn
+        self.device_agent = create_device_agent(rag_service, stream=stream)
+        self.symptom_agent = create_symptom_agent(rag_service, stream=stream)
+        # Knowledge base tool of the problem solver: searches memoized for the session, budgeted per turn
+        self.kb_tool = None
+        if rag_service is not None and config.kb_tool.enabled:
+            self.kb_tool = create_rag_query_tool(rag_service)
+        self.problem_solver_agent = create_problem_solver_agent(
+            rag_service, stream=stream, tools=[self.kb_tool] if self.kb_tool else None
+        )
+
+    @property
+    def agents(self) -> list:
+        return [self.device_agent, self.symptom_agent, self.problem_solver_agent]
+
+    def subscribe_tokens(self, callback: Callable[[str], None]):
+        """Receive streamed LLM tokens of this session's agents"""
+        install_stream_listener()
+        with _token_listeners_lock:
+            for agent in self.agents:
+                _token_listeners[str(agent.id)] = callback
+
+    def unsubscribe_tokens(self):
+        with _token_listeners_lock:
+            for agent in self.agents:
+                _token_listeners.pop(str(agent.id), None)
+
+    def to_dict(self) -> dict:
+        """Public view of the session state"""
+        return {
+            "session_id": self.session_id,
+            "stage": self.stage,
+            "device_confirmed": self.device_confirmed,
+            "device_id": self.device_id,
+            "symptom_questions_count": self.symptom_questions_count,
+            "questionnaire": self.questionnaire.to_dict(),
+            "symptom_slots": self.symptom_slots.filled(),
+            "problem_solving_step": self.problem_solving_step,
+            "awaiting_solution_confirmation": self.awaiting_solution_confirmation,
+            "last_intent": self.last_intent,
+            "retrieval": self.retrieval_state.to_dict() if self.retrieval_state else None,
+        }
+
+    def handle_message(
+        self,
+        user_message: str,
+        on_progress: Callable[[dict], None] = None,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> str:
+        """
+        Process one user message in the current stage
+
+        Args:
+            user_message: The user's message
+            on_progress: Optional callback receiving progress events
+            cancel_token: Optional token that stops the turn before its next LLM call;
+                a cancelled turn leaves the session state unchanged
+
+        Returns:
+            The agent's response
+
+        Raises:
+            OperationCancelled: If the token was cancelled before the turn finished
+        """
+        self._cancel_token = cancel_token
+        if self.kb_tool is not None:
+            self.kb_tool.new_turn()
+        def progress(detail: str):
+            if on_progress:
+                on_progress({"type": "progress", "stage": self.stage, "detail": detail})
+
+        if self.stage == STAGE_INITIAL:
+            progress("Analyzing device type...")
+            return self._identify_device(user_message)
+        if self.stage == STAGE_DEVICE_CONFIRMED:
+            progress("Gathering symptom details...")
+            return self._gather_symptoms(user_message)
+        if self.stage == STAGE_SYMPTOMS_GATHERED:
+            response = self._answer_reply_locally(user_message)
+            if response:
+                return response
+            progress("Analyzing solutions...")
+            return self._solve_problem(user_message)
+        return COMPLETE_MESSAGE
+
+    def mark_solved(self) -> str:
+        """User confirmed the last troubleshooting step fixed the issue"""
+        self._discard_speculation()
+        self.awaiting_solution_confirmation = False
+        self.stage = STAGE_COMPLETE
+        return SOLVED_MESSAGE
+
+    def mark_not_solved(self, cancel_token: Optional[CancelToken] = None) -> str:
+        """
+        User reported the last troubleshooting step did not help
+
+        Args:
+            cancel_token: Optional token that stops waiting for a speculated step
+
+        Returns:
+            The speculated next step if one was prepared, otherwise a request for details
+        """
+        self._cancel_token = cancel_token
+        self.awaiting_solution_confirmation = False
+        speculated = self._take_speculation()
+        if speculated:
+            return self._record_step(FAILURE_REPORT, speculated)
+        return NOT_SOLVED_MESSAGE
+
+    def _kickoff(self, crew: Crew, inputs: dict, cancel_token: Optional[CancelToken] = None):
+        """Run a crew, honouring the given cancel token or else the one of the current turn"""
+        cancel_token = cancel_token or self._cancel_token
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        # The session's agents outlive the run, so only this run's share of their usage is recorded
+        usage_before = token_usage_snapshot(crew.agents)
+        try:
+            with bind_crew(crew, cancel_token):
+                return crew.kickoff(inputs=inputs)
+        finally:
+            record_agent_token_usage(crew.agents, since=usage_before)
+
+    def _identify_device(self, user_message: str) -> str:
+        if self.pending_device:
+            answer = parse_confirmation(user_message)
+            if answer:
+                return self._confirm_device(self.pending_device, self._pending_report)
+            self.pending_device = None
+            if answer is False:
+                record_outcome("rejected")
+            # Not a plain yes: the message may name the device, otherwise the agent takes over
+
+        if config.device_match.enabled:
+            response = self._identify_device_locally(user_message)
+            if response:
+                return response
+
+        record_outcome("agent")
+        device_task = create_device_identification_task(self.device_agent)
+        device_crew = Crew(
+            agents=[self.device_agent],
+            tasks=[device_task],
+            verbose=False,
+        )
+        device_result = self._kickoff(device_crew, {"user_problem": user_message})
+
+        self.device_confirmed = str(device_result)
+        self.device_id = identify_device(self.device_confirmed, device_catalog())
+        self.stage = STAGE_DEVICE_CONFIRMED
+        self._add_retrieval_turn(user_message)
+        self._prefetch(user_message)
+        return self.device_confirmed
+
+    def _identify_device_locally(self, user_message: str) -> Optional[str]:
+        """Ask the user to confirm a confidently matched device; None leaves the message to the agent"""
+        matcher = matcher_for(device_catalog())
+        match = matcher.match(user_message)
+        if match.ambiguous or match.confidence < config.device_match.min_confidence:
+            return None
+
+        record_outcome("local")
+        self.pending_device = match.device
+        # Keep the message if it describes the problem too, it then opens the symptom stage
+        extra_words = len(user_message.split()) - len(match.matched_text.split())
+        self._pending_report = user_message if extra_words >= MIN_REPORT_WORDS else ""
+        template = DEVICE_CONFIRM_MESSAGE if match.method == "exact" else DEVICE_GUESS_MESSAGE
+        return template.format(description=matcher.describe(match.device))
+
+    def _confirm_device(self, device: str, report: str) -> str:
+        """The user confirmed the locally identified device: move on to the symptoms"""
+        self.pending_device = None
+        self._pending_report = ""
+        self.device_id = device
+        self.device_confirmed = f"{matcher_for(device_catalog()).describe(device)} (confirmed by the user)"
+        self.stage = STAGE_DEVICE_CONFIRMED
+
+        if report:
+            # The first message already described the problem, start gathering symptoms with it
+            try:
+                return self._gather_symptoms(report)
+            except OperationCancelled:
+                # Leave the confirmation pending so the turn can be retried
+                self.pending_device, self._pending_report = device, report
+                self.device_id = self.device_confirmed = None
+                self.stage = STAGE_INITIAL
+                raise
+        self._prefetch()
+        return DEVICE_PROBLEM_MESSAGE.format(device=device)
+
+    def _gather_symptoms(self, user_message: str) -> str:
+        # A bare "yes" answers the device agent's confirmation question, not a symptom question
+        is_confirmation = not self.questionnaire.started and parse_confirmation(user_message) is not None \
+            and len(user_message.split()) <= 3
+        question = self.questionnaire.respond("" if is_confirmation else user_message)
+        self.symptom_questions_count = self.questionnaire.answered
+        if not is_confirmation:
+            self._add_retrieval_turn(user_message)
+        self._prefetch()
+        if question:
+            return question
+
+        # All questions answered: a single LLM call summarizes them
+        try:
+            summary = self._summarize_symptoms()
+        except OperationCancelled:
+            self.questionnaire.retract()
+            self.symptom_questions_count = self.questionnaire.answered
+            raise
+        self.symptoms_gathered = f"{self.questionnaire.render()}\n\nSummary: {summary}"
+        self.stage = STAGE_SYMPTOMS_GATHERED
+        return f"{summary}\n\n{SYMPTOMS_COMPLETE_MESSAGE}"
+
+    def _extract_slots(self, user_message: str) -> Dict[str, str]:
+        """Slots found in a message, as answers for the questionnaire"""
+        slots = extract_slots(user_message)
+        settings = config.symptom_slots
+        if (
+            settings.llm_extraction
+            and not self._llm_extraction_done
+            and len(slots.filled()) < len(SymptomSlots.__dataclass_fields__)
+            and len(user_message.split()) >= settings.llm_min_words
+        ):
+            # At most one LLM extraction per session, on the first detailed message
+            self._llm_extraction_done = True
+            if self._cancel_token:
+                self._cancel_token.raise_if_cancelled()
+            slots.merge(llm_extract_slots(create_extraction_llm(), user_message))
+        self.symptom_slots.merge(slots)
+        return slots.answers()
+
+    def _summarize_symptoms(self) -> str:
+        answers = self.questionnaire.render()
+        summary_task = create_symptom_summary_task(self.symptom_agent, self.device_confirmed, answers)
+        summary_crew = Crew(
+            agents=[self.symptom_agent],
+            tasks=[summary_task],
+            verbose=False,
+        )
+        try:
+            return str(self._kickoff(summary_crew, {}))
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            # The structured answers are enough for the problem solver
+            print(f"Symptom summary failed: {e}")
+            return f"Here is what you told me:\n{answers}"
+
+    def _answer_reply_locally(self, user_message: str) -> Optional[str]:
+        """Close the session on "that fixed it" and redirect off-topic messages without an LLM call"""
+        if not config.intent.enabled or self.problem_solving_step == 0:
+            return None
+        result = get_classifier().classify(user_message)
+        log_reply(user_message, result, self.stage)
+        self.last_intent = result.intent
+        if result.intent == INTENT_SOLVED:
+            return self.mark_solved()
+        if result.intent == INTENT_OFF_TOPIC:
+            return OFF_TOPIC_MESSAGE.format(device=self.device_id or "device")
+        if result.intent == INTENT_NOT_SOLVED and \
+                len(user_message.split()) <= config.speculation.plain_failure_max_words:
+            # A plain failure report is what the speculation assumed
+            speculated = self._take_speculation()
+            if speculated:
+                return self._record_step(user_message, speculated)
+        # Not solved, a question or unclear: the problem solver answers
+        return None
+
+    def _solve_problem(self, user_message: str) -> str:
+        # The reply changes the troubleshooting history the speculation was based on
+        self._discard_speculation()
+        solver_response = self._solver_response(
+            self.problem_solver_agent,
+            user_message,
+            self.solving_memory.render(),
+            self.problem_solving_step,
+        )
+        return self._record_step(user_message, solver_response)
+
+    def _solver_response(
+        self,
+        agent,
+        user_message: str,
+        solving_history: str,
+        step: int,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> str:
+        """Run the problem solver for a user reply (also used for speculative runs)"""
+        problem_context = f"""
+Device Information: {self.device_confirmed}
+
+Symptoms Gathered: {self.symptoms_gathered}
+
+Previous troubleshooting steps:
+{solving_history}
+
+Current step number: {step}
+
+Latest user reply: {user_message}
+"""
+        solver_task = create_problem_solver_task(
+            agent,
+            problem_context,
+            rag_service=self.rag_service,
+            device_type=self.device_id,
+            error_code=self.symptom_slots.error_code,
+            solutions=self._knowledge_base_solutions(user_message),
+        )
+        solver_crew = Crew(
+            agents=[agent],
+            tasks=[solver_task],
+            verbose=False,
+        )
+        solver_result = self._kickoff(
+            solver_crew,
+            {
+                "user_response": user_message,
+                "device_info": self.device_confirmed,
+                "symptoms": self.symptoms_gathered,
+                "solving_history": solving_history
+            },
+            cancel_token,
+        )
+        return str(solver_result)
+
+    def _record_step(self, user_message: str, solver_response: str) -> str:
+        self.solving_memory.add_turn(user_message, solver_response)
+        self.problem_solving_step += 1
+        self.awaiting_solution_confirmation = True
+        if agent_reports_resolution(solver_response):
+            self.awaiting_solution_confirmation = False
+            self.stage = STAGE_COMPLETE
+        else:
+            self._add_retrieval_turn(user_message)
+            self._prefetch(user_message)
+            self._speculate()
+
+        return solver_response
+
+    def _speculate(self):
+        """Start generating the next step in the background, assuming the current one fails"""
+        if not config.speculation.enabled or not self._speculation_budget.try_spend():
+            return
+        if self._speculative_agent is None:
+            # A separate agent, so the speculation never shares executor state with a live turn
+            if self.kb_tool is not None:
+                # Its own search budget, but the session's search memo
+                self._speculative_tool = create_rag_query_tool(self.rag_service, memo=self.kb_tool.memo)
+            self._speculative_agent = create_problem_solver_agent(
+                self.rag_service, stream=False, tools=[self._speculative_tool] if self._speculative_tool else None
+            )
+        if self._speculative_tool is not None:
+            self._speculative_tool.new_turn()
+        agent = self._speculative_agent
+        step = self.problem_solving_step
+        history = self.solving_memory.render()
+        self._speculation = Speculation(
+            step,
+            lambda token: self._solver_response(agent, FAILURE_REPORT, history, step, token),
+        )
+
+    def _take_speculation(self) -> Optional[str]:
+        """The speculated next step for the current step, if there is one"""
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return None
+        if speculation.key != self.problem_solving_step:
+            speculation.discard()
+            return None
+        try:
+            return speculation.result(self._cancel_token)
+        except OperationCancelled:
+            self._speculation = speculation  # still valid for a retried turn
+            raise
+
+    def _discard_speculation(self):
+        if self._speculation is not None:
+            self._speculation.discard()
+            self._speculation = None
+
+    def _search_knowledge_base(self, query: str, device_type: str = None, error_code: str = None):
+        # With the retrieval state the query is only the text not added as a turn yet
+        if self.retrieval_state is not None:
+            return self.retrieval_state.search(device_type, error_code, latest_message=query)
+        return search_solutions_for(self.rag_service, query, device_type, error_code)
+
+    def _add_retrieval_turn(self, user_message: str):
+        if self.retrieval_state is not None:
+            self.retrieval_state.add_turn(user_message)
+
+    def _prefetch(self, latest_message: str = ""):
+        """Start a background search for the conversation so far"""
+        if self._retrieval is None:
+            return
+        if self.retrieval_state is not None:
+            # The turns are already in the running query vector; before the first one
+            # search with the device description
+            has_turns = self.retrieval_state.turns > 0
+            query = "" if has_turns else self.device_confirmed or ""
+        else:
+            parts = [self.questionnaire.render() or self.device_confirmed or "", latest_message]
+            query = "\n".join(part for part in parts if part)
+            has_turns = False
+        if query or has_turns:
+            self._retrieval.refresh(query, self.device_id, self.symptom_slots.error_code)
+
+    def _knowledge_base_solutions(self, user_message: str):
+        """
+        Knowledge base results for the solver: the latest background search, else (none
+        has finished yet, and the solver does not wait for it) an inline search with the
+        running query vector, else None to let the task search the full context
+        """
+        if self._retrieval is not None:
+            solutions = self._retrieval.latest()
+            if solutions is not None:
+                return solutions
+        if self.retrieval_state is not None:
+            try:
+                return self.retrieval_state.search(
+                    self.device_id, self.symptom_slots.error_code, latest_message=user_message
+                )
+            except Exception as e:
+                print(f"RAG search failed: {e}")
+                return []
+        return None
+
+    def close(self):
+        """Release background work of the session (call when the conversation ends)"""
+        self._discard_speculation()
+        if self._retrieval is not None:
+            self._retrieval.close()
@@ -0,0 +1,129 @@
+"""
+Request coalescing (single-flight) for identical in-flight work
+Concurrent callers with the same key wait on one shared result instead of repeating the work
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from metrics import registry
+
+COALESCED_CALLS = registry.counter(
+    "singleflight_coalesced_total", "Calls served by waiting on an identical in-flight call", ["group"]
+)
+
+
+class SingleFlight:
+    """Thread-based single-flight group for blocking calls"""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Group name used as the metrics label
+        """
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call with the same key is already running,
+        in which case wait for and return its result (or raise its exception)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            COALESCED_CALLS.inc(group=self.name)
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Single-flight group for coroutines running on one event loop"""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Group name used as the metrics label
+        """
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._on_abandoned: Dict[Hashable, Callable[[], None]] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        coro_factory: Callable[[], Awaitable[Any]],
+        on_abandoned: Callable[[], None] = None,
+    ) -> Any:
+        """
+        Await coro_factory() unless a call with the same key is already running,
+        in which case await its result.
+
+        The shared work runs as its own task, so a caller that is cancelled
+        (e.g. its client disconnected) does not cancel it for the other waiters.
+        If every waiter is cancelled, the leader's on_abandoned callback is invoked
+        so the shared work can be stopped, and the key is released at once: a new
+        call with the same key starts a fresh run instead of joining the abandoned one.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_factory())
+            self._tasks[key] = task
+            self._waiters[key] = 0
+            if on_abandoned:
+                self._on_abandoned[key] = on_abandoned
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            COALESCED_CALLS.inc(group=self.name)
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._tasks.get(key) is task and not task.done():
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0:
+                    del self._tasks[key]
+                    del self._waiters[key]
+                    callback = self._on_abandoned.pop(key, None)
+                    if callback:
+                        callback()
+            raise
+        finally:
+            if self._tasks.get(key) is task and task.done():
+                self._waiters[key] = max(self._waiters[key] - 1, 0)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if not task.cancelled():
+            # Retrieve the outcome so work nobody waits for anymore does not log as unhandled
+            task.exception()
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            self._waiters.pop(key, None)
+            self._on_abandoned.pop(key, None)
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
@@ -0,0 +1,169 @@
+"""
+Symptom slot extraction
+Fills the structured symptom slots (error code, onset, trigger, recent change,
+intermittency) from free text with regexes and keyword lexicons, so questions the
+user already answered are skipped. An optional single LLM call can fill the rest.
+"""
+import json
+import re
+from dataclasses import dataclass, fields
+from typing import Dict, Optional
+
+_NUMBER_WORDS = r"(?:\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten|a few|a couple of|several)"
+_UNITS = r"(?:minutes?|hours?|days?|weeks?|months?|years?)"
+_SENTENCE = re.compile(r"[^.!?\n]+")
+
+ERROR_CODE_PATTERNS = (
+    # "error E5", "error code: 12", "fault F-03", "code #E12"; a code has a letter prefix or at
+    # least two digits ("error 2 times" has none) and is not a model number like EH222
+    re.compile(r"\b(?:error|err|fault|code)(?:\s+code)?\s*[:#]?\s*(?![A-Z]{2}-?\d{3}\b)"
+               r"([A-Z]{1,2}-?\d{1,3}[A-Z]?|\d{2,3}[A-Z]?)\b", re.IGNORECASE),
+    # Bare display codes: "E5", "F03", "E-12" (model numbers like EH222 have two letters)
+    re.compile(r"(?<![\w-])([EFH]-?\d{1,2})(?![\w-])"),
+)
+ONSET_PATTERNS = (
+    re.compile(rf"\b{_NUMBER_WORDS}\s+{_UNITS}\s+ago\b", re.IGNORECASE),
+    re.compile(rf"\b(?:for|over)\s+(?:the\s+(?:last|past)\s+)?{_NUMBER_WORDS}\s+{_UNITS}\b", re.IGNORECASE),
+    re.compile(r"\bsince\s+[^.,;!?]{3,40}", re.IGNORECASE),
+    re.compile(r"\b(?:yesterday|today|this\s+(?:morning|afternoon|evening|week|month)|"
+               r"last\s+(?:night|week|month|year|weekend))\b", re.IGNORECASE),
+)
+TRIGGER_PATTERN = re.compile(
+    r"\b(?:whenever|every\s+time|each\s+time|when\s+(?:i|we|the|it)|after\s+(?:i|we)|if\s+(?:i|we))\b[^.;!?]*",
+    re.IGNORECASE,
+)
+CHANGE_KEYWORDS = (
+    "update", "updated", "firmware", "moved", "relocated", "replaced", "new filter", "installed",
+    "repaired", "cleaned", "descaled", "power outage", "power cut", "dropped", "transported",
+)
+NO_CHANGE_PATTERN = re.compile(r"\b(?:no|nothing|haven't|have not|didn't|did not)\b[^.;!?]{0,20}\b(?:change|changed|changes)\b",
+                               re.IGNORECASE)
+INTERMITTENT_KEYWORDS = (
+    "intermittent", "intermittently", "sometimes", "occasionally", "now and then", "on and off",
+    "comes and goes", "randomly", "from time to time", "every now and",
+)
+CONSTANT_KEYWORDS = (
+    "constantly", "constant", "all the time", "always", "continuously", "never works",
+    "permanently", "non-stop",
+)
+
+
+@dataclass
+class SymptomSlots:
+    """Structured symptom details; None for slots not mentioned yet"""
+    error_code: Optional[str] = None
+    onset: Optional[str] = None
+    trigger: Optional[str] = None
+    recent_change: Optional[str] = None
+    intermittency: Optional[str] = None  # "intermittent" or "constant"
+
+    def filled(self) -> Dict[str, str]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if getattr(self, f.name)}
+
+    def merge(self, other: "SymptomSlots") -> "SymptomSlots":
+        """Fill empty slots from another extraction (existing values win)"""
+        for name, value in other.filled().items():
+            if not getattr(self, name):
+                setattr(self, name, value)
+        return self
+
+    def answers(self) -> Dict[str, str]:
+        """Filled slots as answers to the questionnaire questions they make redundant"""
+        answers = {}
+        if self.error_code:
+            answers["symptoms"] = f"Error code {self.error_code}"
+        for name in ("onset", "trigger", "recent_change", "intermittency"):
+            if getattr(self, name):
+                answers[name] = getattr(self, name)
+        return answers
+
+
+def _sentences(text: str):
+    return [sentence.strip() for sentence in _SENTENCE.findall(text) if sentence.strip()]
+
+
+def _first(patterns, text: str, group: int = 0) -> Optional[str]:
+    for pattern in patterns:
+        found = pattern.search(text)
+        if found:
+            return found.group(group).strip()
+    return None
+
+
+def _contains(text: str, keywords) -> bool:
+    return any(re.search(rf"\b{re.escape(keyword)}\b", text) for keyword in keywords)
+
+
+def extract_slots(text: str) -> SymptomSlots:
+    """
+    Fill symptom slots from a user message without an LLM call
+
+    Args:
+        text: User message
+
+    Returns:
+        The slots found in the message
+    """
+    slots = SymptomSlots()
+    if not text:
+        return slots
+
+    code = _first(ERROR_CODE_PATTERNS, text, group=1)
+    if code:
+        slots.error_code = code.upper()
+    slots.onset = _first(ONSET_PATTERNS, text)
+    trigger = TRIGGER_PATTERN.search(text)
+    if trigger:
+        slots.trigger = trigger.group(0).strip()
+
+    lowered = text.lower()
+    if NO_CHANGE_PATTERN.search(text):
+        slots.recent_change = "none"
+    else:
+        for sentence in _sentences(text):
+            if _contains(sentence.lower(), CHANGE_KEYWORDS):
+                slots.recent_change = sentence
+                break
+
+    intermittent = _contains(lowered, INTERMITTENT_KEYWORDS)
+    constant = _contains(lowered, CONSTANT_KEYWORDS)
+    if intermittent != constant:  # both or neither: leave it to the question
+        slots.intermittency = "intermittent" if intermittent else "constant"
+    return slots
+
+
+LLM_EXTRACTION_PROMPT = """Extract symptom details from a device support message.
+Answer with a JSON object with the keys error_code, onset, trigger, recent_change and
+intermittency ("intermittent" or "constant"). Use null for anything the message does not say.
+
+Message:
+{message}"""
+
+
+def llm_extract_slots(llm, text: str) -> SymptomSlots:
+    """
+    Fill symptom slots with a single LLM call
+
+    Args:
+        llm: LLM with call(messages)
+        text: User message
+
+    Returns:
+        The slots the LLM found; empty slots if the call or its JSON fails
+    """
+    try:
+        response = str(llm.call([{"role": "user", "content": LLM_EXTRACTION_PROMPT.format(message=text)}]))
+        start, end = response.find("{"), response.rfind("}")
+        data = json.loads(response[start:end + 1]) if start != -1 else {}
+    except Exception as e:
+        print(f"Slot extraction failed: {e}")
+        return SymptomSlots()
+
+    slots = SymptomSlots()
+    for f in fields(slots):
+        value = data.get(f.name)
+        if value not in (None, "", "null"):
+            setattr(slots, f.name, str(value).strip())
+    if slots.intermittency and slots.intermittency.lower() not in ("intermittent", "constant"):
+        slots.intermittency = None
+    return slots
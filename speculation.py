@@ -0,0 +1,100 @@
+"""
+Speculative execution of the next troubleshooting step
+While the user tries a step, the step to suggest if it fails is generated in the
+background. A failure report is then answered at once; any other reply discards
+the speculation (cancelling it before its next LLM call).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Optional
+
+from cancellation import CancelToken, REASON_DISCARDED
+from config import config
+from metrics import registry
+
+SPECULATIONS = registry.counter(
+    "crewai_speculations_total",
+    "Speculative troubleshooting steps by outcome (started, served, discarded, failed, over_budget)",
+    ["outcome"],
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=config.speculation.max_workers, thread_name_prefix="speculation"
+            )
+        return _executor
+
+
+class Speculation:
+    """A background run producing the response for an assumed user reply"""
+
+    def __init__(self, key, run: Callable[[CancelToken], str]):
+        """
+        Start the run
+
+        Args:
+            key: What the speculation assumed (e.g. the step number); it is only served for the same key
+            run: Function (cancel_token) -> response
+        """
+        self.key = key
+        self.token = CancelToken()
+        self.future = _get_executor().submit(run, self.token)
+        SPECULATIONS.inc(outcome="started")
+
+    def result(self, cancel_token: Optional[CancelToken] = None, poll_seconds: float = 0.25) -> Optional[str]:
+        """
+        Wait for the speculative response
+
+        Args:
+            cancel_token: Token of the waiting turn, checked while waiting
+
+        Returns:
+            The response, or None if the run failed or was cancelled
+
+        Raises:
+            OperationCancelled: If the waiting turn was cancelled (the speculation keeps running)
+        """
+        while True:
+            try:
+                response = self.future.result(timeout=poll_seconds)
+                break
+            except FutureTimeout:
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+            except Exception:  # the run failed or was cancelled
+                SPECULATIONS.inc(outcome="failed")
+                return None
+        SPECULATIONS.inc(outcome="served")
+        return response
+
+    def discard(self):
+        """Drop the speculation; a run still in progress stops before its next LLM call"""
+        self.token.cancel(REASON_DISCARDED)
+        self.future.cancel()
+        SPECULATIONS.inc(outcome="discarded")
+
+
+class SpeculationBudget:
+    """Caps the speculative runs of one session"""
+
+    def __init__(self, max_runs: int):
+        self.max_runs = max_runs
+        self.used = 0
+
+    def try_spend(self) -> bool:
+        if self.used >= self.max_runs:
+            SPECULATIONS.inc(outcome="over_budget")
+            return False
+        self.used += 1
+        return True
+
+    @property
+    def remaining(self) -> int:
+        return max(self.max_runs - self.used, 0)
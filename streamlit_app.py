@@ -17,6 +17,7 @@ from crewai import Crew
 from agents import create_device_agent, create_symptom_agent, create_problem_solver_agent
 from tasks import create_device_identification_task, create_symptom_gathering_task, create_problem_solver_task
 from rag_service import RAGService
+from memory import create_memory
 
 # Page config
 st.set_page_config(
@@ -88,6 +89,10 @@ if "stage" not in st.session_state:
 if "input_reset" not in st.session_state:
     st.session_state.input_reset = 0
 
+if "memory" not in st.session_state:
+    # Recent turns verbatim, older ones summarized, within a token ceiling
+    st.session_state.memory = create_memory("conversation")
+
 if "rag_service" not in st.session_state:
     try:
         st.session_state.rag_service = RAGService(
@@ -208,11 +213,8 @@ if send_button and user_input:
                 print("[STAGE 2/3] Symptom Gathering")
                 symptom_agent = create_symptom_agent()
                 
-                # Get conversation context
-                conversation_context = "\n".join([
-                    f"{m['role'].upper()}: {m['content'][:200]}"
-                    for m in st.session_state.messages[:-1]  # Exclude current message
-                ])
+                # Get conversation context (previous turns, excluding the current message)
+                conversation_context = st.session_state.memory.render()
                 
                 symptom_task = create_symptom_gathering_task(symptom_agent, conversation_context)
                 
@@ -232,11 +234,8 @@ if send_button and user_input:
                 print("[STAGE 3/3] Problem Solving")
                 problem_solver_agent = create_problem_solver_agent()
                 
-                # Get full conversation context
-                conversation_context = "\n".join([
-                    f"{m['role'].upper()}: {m['content'][:300]}"
-                    for m in st.session_state.messages[:-1]  # Exclude current message
-                ])
+                # Get conversation context (previous turns, excluding the current message)
+                conversation_context = st.session_state.memory.render()
                 
                 problem_task = create_problem_solver_task(
                     problem_solver_agent,
@@ -254,6 +253,8 @@ if send_button and user_input:
                 result = crew.kickoff(inputs={"user_input": user_input, "context": conversation_context})
                 response = str(result)
             
+            st.session_state.memory.add_turn(user_input, response)
+            
             print(f"\n{'-'*80}")
             print(f"✓ Stage completed successfully")
             print(f"{'='*80}\n")
@@ -284,4 +285,5 @@ if len(st.session_state.messages) > 0:
     with col2:
         if st.button("🔄 Clear History", use_container_width=True):
             st.session_state.messages = []
+            st.session_state.memory.clear()
             st.rerun()
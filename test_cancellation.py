@@ -0,0 +1,42 @@
+"""
+Unit tests for cooperative cancellation
+"""
+import time
+
+import pytest
+
+from cancellation import (
+    REASON_DEADLINE, REASON_DISCARDED, REASON_DISCONNECTED,
+    CancelToken, OperationCancelled, task_checkpoint,
+)
+
+
+def test_first_reason_wins():
+    token = CancelToken()
+    assert not token.cancelled
+    token.cancel(REASON_DISCARDED)
+    token.cancel(REASON_DISCONNECTED)
+    with pytest.raises(OperationCancelled) as raised:
+        token.raise_if_cancelled()
+    assert raised.value.reason == REASON_DISCARDED
+
+
+def test_deadline_cancels():
+    token = CancelToken(timeout_seconds=0.01)
+    assert token.remaining() <= 0.01
+    time.sleep(0.02)
+    assert token.cancelled
+    assert token.reason == REASON_DEADLINE
+    assert CancelToken().remaining() is None
+
+
+def test_task_checkpoint_runs_the_callback_first():
+    outputs = []
+    token = CancelToken()
+    check = task_checkpoint(token, outputs.append)
+    check("first")
+    token.cancel()
+    with pytest.raises(OperationCancelled):
+        check("second")
+    assert outputs == ["first", "second"]
+    assert task_checkpoint(None, outputs.append) == outputs.append
@@ -0,0 +1,44 @@
+"""
+Unit tests for LLM record/replay cassettes
+"""
+import asyncio
+
+import pytest
+
+from cassette import Cassette, CassetteMiss, RecordingLLM, ReplayLLM, prompt_key
+from loadtest import FakeLLM
+
+PROMPT = [{"role": "user", "content": "My EH222 shows E5"}]
+
+
+def test_prompt_key_ignores_extra_fields():
+    assert prompt_key(PROMPT) == prompt_key([{"role": "user", "content": "My EH222 shows E5", "name": "x"}])
+    assert prompt_key(PROMPT) != prompt_key([{"role": "user", "content": "My EH130 shows E5"}])
+    assert prompt_key("hello") == prompt_key([{"role": "user", "content": "hello"}])
+
+
+def test_repeated_prompts_replay_in_order(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"))
+    cassette.record(PROMPT, "first")
+    cassette.record(PROMPT, "second")
+    # A new cassette reads the file back
+    cassette = Cassette(cassette.path)
+    assert len(cassette) == 2
+    assert [cassette.replay(PROMPT)["response"] for _ in range(3)] == ["first", "second", "second"]
+    cassette.rewind()
+    assert cassette.replay(PROMPT)["response"] == "first"
+    with pytest.raises(CassetteMiss):
+        cassette.replay([{"role": "user", "content": "never recorded"}])
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = RecordingLLM(FakeLLM(latency=0.0, tokens_per_second=0.0, response="Final Answer: reset it"), Cassette(path))
+    recorded = [recorder.call(PROMPT), asyncio.run(recorder.acall(PROMPT))]
+
+    replay = ReplayLLM(Cassette(path), model="gpt-4")
+    replayed = [replay.call(PROMPT), asyncio.run(replay.acall(PROMPT))]
+    assert replayed == recorded == ["Final Answer: reset it"] * 2
+    assert replay.get_token_usage_summary().completion_tokens == 2 * len("Final Answer: reset it".split())
+    with pytest.raises(CassetteMiss):
+        replay.call([{"role": "user", "content": "never recorded"}])
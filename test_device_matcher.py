@@ -0,0 +1,55 @@
+"""
+Unit tests for local device identification
+"""
+import pytest
+
+from device_matcher import DeviceMatcher, identify_device, parse_confirmation
+
+DEVICES = (("EH222", "Ice Cube Machine"), ("EH130", "Ice Machine"), ("EH330", "Ice Maker"))
+
+
+@pytest.mark.parametrize("text, device, method", [
+    ("I have an EH222", "EH222", "exact"),
+    ("my eh-130 broke", "EH130", "exact"),
+    ("eh two two two", "EH222", "alias"),
+    ("it's the 330", "EH330", "number"),
+    ("EH223 not working", "EH222", "fuzzy"),
+    ("my fridge", None, "none"),
+])
+def test_match(text, device, method):
+    match = DeviceMatcher(DEVICES).match(text)
+    assert (match.device, match.method) == (device, method)
+
+
+def test_two_devices_are_ambiguous():
+    match = DeviceMatcher(DEVICES).match("I have EH222 and EH130")
+    assert match.ambiguous
+    assert match.alternatives == ["EH130"]
+    assert match.confidence < 1.0
+
+
+@pytest.mark.parametrize("text, device", [
+    ("My EH222 shows E5", "EH222"),
+    ("it's the 330", "EH330"),
+    ("I have EH222 and EH130", None),  # ambiguous
+    ("my fridge", None),
+])
+def test_identify_device(text, device):
+    assert identify_device(text, DEVICES) == device
+
+
+def test_identify_device_drops_weak_matches():
+    assert identify_device("EH 22 is broken", DEVICES, min_confidence=0.7) == "EH222"
+    assert identify_device("EH 22 is broken", DEVICES, min_confidence=0.8) is None
+
+
+@pytest.mark.parametrize("text, answer", [
+    ("yes", True),
+    ("correct!", True),
+    ("Yes, it is", True),
+    ("no that's wrong", False),
+    ("what?", None),
+    ("my EH222 makes a loud grinding noise whenever the ice bin is full and the door is open", None),
+])
+def test_parse_confirmation(text, answer):
+    assert parse_confirmation(text) is answer
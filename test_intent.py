@@ -0,0 +1,62 @@
+"""
+Unit tests for the local reply intent classifier
+"""
+import pytest
+
+from intent import (
+    INTENT_MORE_INFO, INTENT_NOT_SOLVED, INTENT_SOLVED,
+    IntentClassifier, NaiveBayesIntentModel, agent_reports_resolution,
+)
+
+
+@pytest.mark.parametrize("text, intent", [
+    # Negated and contracted failure reports
+    ("this hasn't fixed it", INTENT_NOT_SOLVED),
+    ("the issue isn't solved", INTENT_NOT_SOLVED),
+    ("it hasn't been resolved", INTENT_NOT_SOLVED),
+    ("that wasn't fixed", INTENT_NOT_SOLVED),
+    ("it isn't working again", INTENT_NOT_SOLVED),
+    ("It doesn't work", INTENT_NOT_SOLVED),
+    ("Didn't help", INTENT_NOT_SOLVED),
+    ("not fixed", INTENT_NOT_SOLVED),
+    ("it's no longer working", INTENT_NOT_SOLVED),
+    ("the problem is solved? no", INTENT_NOT_SOLVED),
+    ("still not making ice", INTENT_NOT_SOLVED),
+    ("nope", INTENT_NOT_SOLVED),
+    # Partial fixes never close the session
+    ("it works but only sometimes", INTENT_NOT_SOLVED),
+    ("Thanks, that fixed the noise but it still doesn't make ice", INTENT_NOT_SOLVED),
+    ("that helped but it won't make ice", INTENT_NOT_SOLVED),
+    ("it's working again, but the light is still blinking", INTENT_NOT_SOLVED),
+    # Successes
+    ("that fixed it", INTENT_SOLVED),
+    ("It works now, thanks!", INTENT_SOLVED),
+    ("yes it worked", INTENT_SOLVED),
+    ("it's working again", INTENT_SOLVED),
+    # Questions
+    ("how do I reset it?", INTENT_MORE_INFO),
+    # Acknowledgements alone are too weak to decide
+    ("Yes", None),
+    ("ok", None),
+    ("okay thanks", None),
+    ("I resolved to try again tomorrow", None),
+])
+def test_lexicon(text, intent):
+    assert IntentClassifier().classify(text).intent == intent
+
+
+def test_model_decides_what_lexicon_cannot():
+    model = NaiveBayesIntentModel().train([
+        ("the ice maker is making cubes now", INTENT_SOLVED),
+        ("cubes are coming out now", INTENT_SOLVED),
+        ("the light keeps blinking", INTENT_NOT_SOLVED),
+        ("it keeps blinking red", INTENT_NOT_SOLVED),
+    ])
+    result = IntentClassifier(model=model).classify("the light keeps blinking red")
+    assert (result.intent, result.source) == (INTENT_NOT_SOLVED, "model")
+    assert NaiveBayesIntentModel.from_dict(model.to_dict()).predict("cubes now") == model.predict("cubes now")
+
+
+def test_agent_reports_resolution():
+    assert agent_reports_resolution("Great, glad it's working again!")
+    assert not agent_reports_resolution("Next, unplug the unit for 10 minutes.")
@@ -0,0 +1,80 @@
+"""
+Unit tests for job webhooks: local-only hosts, pinned addresses, no redirects
+"""
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import jobs
+
+
+class WebhookServer(HTTPServer):
+    def __init__(self):
+        self.received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(handler):
+                body = handler.rfile.read(int(handler.headers["Content-Length"]))
+                self.received.append((handler.path, json.loads(body)))
+                if handler.path == "/redirect":
+                    handler.send_response(307)
+                    handler.send_header("Location", "http://93.184.216.34/hook")
+                else:
+                    handler.send_response(200)
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(("127.0.0.1", 0), Handler)
+
+
+@pytest.fixture
+def server():
+    server = WebhookServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_validate_rejects_non_local_hosts():
+    assert jobs.validate_webhook_url("http://127.0.0.1:9000/hook") == "http://127.0.0.1:9000/hook"
+    assert jobs.resolve_webhook_address("https://10.0.0.5/hook") == ("10.0.0.5", 443)
+    with pytest.raises(ValueError):
+        jobs.validate_webhook_url("http://93.184.216.34/hook")
+    with pytest.raises(ValueError):
+        jobs.validate_webhook_url("ftp://127.0.0.1/hook")
+
+
+def test_send_delivers_payload(server):
+    jobs.send_webhook(f"http://127.0.0.1:{server.server_port}/hook", {"job_id": "1"})
+    assert server.received == [("/hook", {"job_id": "1"})]
+
+
+def test_send_does_not_follow_redirects(server):
+    with pytest.raises(OSError):
+        jobs.send_webhook(f"http://127.0.0.1:{server.server_port}/redirect", {"job_id": "1"})
+    assert [path for path, _ in server.received] == ["/redirect"]
+
+
+def test_send_connects_to_the_validated_address(server, monkeypatch):
+    # DNS rebinding: the host is local when validated, public on any later lookup
+    lookups = []
+    getaddrinfo = socket.getaddrinfo
+
+    def rebinding_getaddrinfo(host, port, *args, **kwargs):
+        if host == "rebind.test":
+            lookups.append(host)
+            host = "127.0.0.1" if len(lookups) == 1 else "93.184.216.34"
+        return getaddrinfo(host, port, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", rebinding_getaddrinfo)
+    jobs.send_webhook(f"http://rebind.test:{server.server_port}/hook", {"job_id": "1"}, timeout=2)
+    assert lookups == ["rebind.test"]
+    assert server.received == [("/hook", {"job_id": "1"})]
@@ -0,0 +1,41 @@
+"""
+Unit tests for the offline load test harness (fake LLM, in-memory Qdrant)
+"""
+import argparse
+import asyncio
+import threading
+
+import crewai_api
+import loadtest
+
+
+def make_args(**overrides):
+    args = dict(requests=4, concurrency=2, llm_latency=0.0, tokens_per_second=0.0,
+                identical=False, workers=4)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_compare_mode_reports_each_run_without_warm_up():
+    original_executor = crewai_api.executor
+    reports = {mode: asyncio.run(loadtest.run_load_test(make_args(), mode)) for mode in ("async", "thread")}
+    reports["thread"] = asyncio.run(loadtest.run_load_test(make_args(), "thread"))
+
+    for mode, report in reports.items():
+        assert report["config"]["mode"] == mode
+        assert report["config"]["workers"] == 4
+        assert report["completed"] == 4 and not report["errors"]
+        assert not [name for name in report["latency_s"] if "warmup" in name]
+    # The run's worker pool is shut down and the API's own executor restored
+    assert crewai_api.executor is original_executor
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("crew-worker")]
+
+
+
+def test_percentile_is_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert loadtest.percentile(samples, 50) == 50.0
+    assert loadtest.percentile(samples, 99) == 99.0
+    assert loadtest.percentile(samples, 100) == 100.0
+    assert loadtest.percentile([3.0], 95) == 3.0
+    assert loadtest.summarize([])["count"] == 0
@@ -0,0 +1,43 @@
+"""
+Unit tests for the rolling conversation memory
+"""
+from memory import ConversationMemory, count_tokens, truncate_to_tokens
+
+
+def test_old_turns_are_folded_into_the_summary():
+    memory = ConversationMemory(window_turns=2, max_tokens=1000)
+    for i in range(4):
+        memory.add_turn(f"user message {i}", f"agent reply {i}")
+    assert len(memory) == 4
+    assert [turn.user for turn in memory.turns] == ["user message 2", "user message 3"]
+    assert "user message 0" in memory.summary and "user message 1" in memory.summary
+    assert memory.render().startswith("Summary of earlier conversation:")
+
+
+def test_context_stays_under_the_ceiling():
+    memory = ConversationMemory(window_turns=4, max_tokens=120)
+    for i in range(20):
+        memory.add_turn(f"turn {i}: " + "the ice maker still does not work " * 5, "try this step " * 20)
+        assert count_tokens(memory.render()) <= 120
+    assert memory.turns
+
+
+def test_custom_summarizer():
+    calls = []
+
+    def summarize(summary, turns):
+        calls.append(len(turns))
+        return f"{summary}+{len(turns)}"
+
+    memory = ConversationMemory(window_turns=1, max_tokens=1000, summarizer=summarize)
+    memory.add_turn("a", "b")
+    memory.add_turn("c", "d")
+    assert memory.summary == "+1"
+    assert calls == [1]
+
+
+def test_truncate_to_tokens():
+    text = "one two three four five six seven eight nine ten " * 10
+    assert count_tokens(truncate_to_tokens(text, 5)) <= 5
+    assert truncate_to_tokens(text, 1000) == text
+    assert truncate_to_tokens(text, 0) == ""
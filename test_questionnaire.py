@@ -0,0 +1,36 @@
+"""
+Unit tests for the symptom questionnaire
+"""
+from questionnaire import SYMPTOM_QUESTIONS, SymptomQuestionnaire
+from slot_extractor import extract_slots
+
+
+def test_walks_through_the_questions():
+    questionnaire = SymptomQuestionnaire()
+    assert questionnaire.respond("my EH222 makes no ice") == SYMPTOM_QUESTIONS[0].text
+    for question in SYMPTOM_QUESTIONS[1:]:
+        assert questionnaire.respond("some answer").endswith(question.text)
+    assert questionnaire.respond("last answer") is None
+    assert questionnaire.complete
+    assert questionnaire.answered == len(SYMPTOM_QUESTIONS)
+    assert questionnaire.render().startswith("- Initial report: my EH222 makes no ice")
+
+
+def test_skips_questions_the_extractor_answers():
+    questionnaire = SymptomQuestionnaire(extractor=lambda text: extract_slots(text).answers())
+    question = questionnaire.respond("it shows E5 since yesterday")
+    assert questionnaire.answers == {"symptoms": "Error code E5", "onset": "since yesterday"}
+    assert questionnaire.extracted == ["symptoms", "onset"]
+    assert question.endswith(SYMPTOM_QUESTIONS[2].text)
+
+
+def test_retract_undoes_the_last_answer():
+    questionnaire = SymptomQuestionnaire()
+    questionnaire.respond("my EH222 makes no ice")
+    questionnaire.respond("it is silent")
+    questionnaire.retract()
+    assert questionnaire.answers == {}
+    assert questionnaire.pending == SYMPTOM_QUESTIONS[0]
+    questionnaire.retract()
+    assert not questionnaire.started
+    assert questionnaire.initial_report == ""
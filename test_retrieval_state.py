@@ -0,0 +1,96 @@
+"""
+Unit tests for the incremental retrieval state
+"""
+import threading
+
+from rag_service import LocalHashEmbedder
+from retrieval_state import RetrievalState, key_terms
+
+
+class FakeRAGService:
+    """Counts embeddings and returns fixed search results"""
+
+    def __init__(self, solutions=()):
+        self.embedder = LocalHashEmbedder()
+        self.embedded = []
+        self.solutions = list(solutions)
+
+    def embed(self, text):
+        self.embedded.append(text)
+        return self.embedder.embed([text])[0]
+
+    def search_by_vector(self, query_embedding, device_type=None, limit=3, device_filter=False, filters=None):
+        return [dict(solution) for solution in self.solutions][:limit]
+
+
+def test_key_terms():
+    assert key_terms("My EH222 shows E5 and it is not making ice") == ["eh222", "shows", "e5", "making", "ice"]
+
+
+def test_each_turn_is_embedded_once():
+    rag = FakeRAGService()
+    state = RetrievalState(rag, decay=0.5)
+    assert state.query_vector() is None
+    state.add_turn("my EH222 is not making ice")
+    state.query_vector()
+    state.add_turn("it shows E5")
+    state.query_vector()
+    state.query_vector()
+    assert rag.embedded == ["my EH222 is not making ice", "it shows E5"]
+    assert state.to_dict()["embeddings"] == 2
+
+
+def test_previewed_reply_is_not_embedded_again():
+    rag = FakeRAGService()
+    state = RetrievalState(rag)
+    state.add_turn("my EH222 is not making ice")
+    state.query_vector(latest_message="the fan is loud")
+    state.add_turn("the fan is loud")
+    state.query_vector()
+    assert rag.embedded == ["my EH222 is not making ice", "the fan is loud"]
+
+
+def test_embedding_does_not_hold_the_lock():
+    class SlowRAGService(FakeRAGService):
+        def __init__(self):
+            super().__init__()
+            self.started, self.release = threading.Event(), threading.Event()
+
+        def embed(self, text):
+            self.started.set()
+            self.release.wait(5)
+            return super().embed(text)
+
+    rag = SlowRAGService()
+    state = RetrievalState(rag)
+    state.add_turn("my EH222 is not making ice")
+    search = threading.Thread(target=state.query_vector)
+    search.start()
+    assert rag.started.wait(5)
+    added = threading.Thread(target=state.add_turn, args=("it shows E5",))
+    added.start()
+    added.join(1)
+    assert not added.is_alive()
+    rag.release.set()
+    search.join(5)
+    state.query_vector()
+    assert rag.embedded == ["my EH222 is not making ice", "it shows E5"]
+    assert state.to_dict()["embeddings"] == 2
+
+
+def test_older_terms_decay():
+    state = RetrievalState(FakeRAGService(), decay=0.5)
+    state.add_turn("grinding noise")
+    state.add_turn("loud noise")
+    assert state.terms == {"noise": 1.5, "loud": 1.0, "grinding": 0.5}
+
+
+def test_search_boosts_results_with_key_terms():
+    rag = FakeRAGService([
+        {"problem": "Unit is leaking water", "solution": "Check the drain", "score": 0.5},
+        {"problem": "Loud grinding noise", "solution": "Clean the fan", "score": 0.45},
+    ])
+    state = RetrievalState(rag, term_boost=0.2)
+    state.add_turn("there is a grinding noise")
+    results = state.search("EH222", limit=1)
+    assert [result["problem"] for result in results] == ["Loud grinding noise"]
@@ -0,0 +1,56 @@
+"""
+Unit tests for the semantic response cache
+"""
+import hashlib
+
+from semantic_cache import SemanticCache, message_scope, normalize_message
+
+DEVICES = (("EH222", "Ice Cube Machine"), ("EH130", "Ice Machine"), ("EH330", "Ice Maker"))
+
+
+def word_embedding(text):
+    """Bag-of-words vector: messages differing in one word are very similar"""
+    vector = [0.0] * 64
+    for word in normalize_message(text).split():
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+    return vector
+
+
+def make_cache(**kwargs):
+    return SemanticCache(embed_fn=word_embedding, threshold=0.8, devices=DEVICES, **kwargs)
+
+
+def test_message_scope():
+    assert message_scope("My EH222 shows E5 and won't make ice", DEVICES) == "EH222|E5"
+    assert message_scope("my eh 130 is broken", DEVICES) == "EH130|"
+    assert message_scope("my ice maker is broken", DEVICES) == "|"
+
+
+def test_similar_message_hits():
+    cache = make_cache()
+    cache.store("My EH222 shows E5 and won't make ice", "stage", "reply for EH222")
+    assert cache.lookup("my EH222 shows E5 and will not make ice!", "stage") == "reply for EH222"
+
+
+def test_other_device_or_error_code_misses():
+    cache = make_cache()
+    cache.store("My EH130 shows E5 and won't make ice", "stage", "reply for EH130")
+    assert cache.lookup("My EH222 shows E5 and won't make ice", "stage") is None
+    assert cache.lookup("My EH130 shows E7 and won't make ice", "stage") is None
+    assert cache.lookup("My EH130 shows E5 and won't make ice", "stage") == "reply for EH130"
+
+
+def test_stage_and_ttl():
+    cache = make_cache()
+    cache.store("my EH222 is broken", "first", "reply")
+    assert cache.lookup("my EH222 is broken", "second") is None
+    cache.store("my EH330 is broken", "first", "expired", ttl_seconds=0)
+    assert cache.lookup("my EH330 is broken", "first") is None
+
+
+def test_lru_eviction():
+    cache = make_cache(max_entries=2)
+    for device in ("EH222", "EH130", "EH330"):
+        cache.store(f"my {device} is broken", "stage", device)
+    assert len(cache) == 2
+    assert cache.lookup("my EH222 is broken", "stage") is None
@@ -0,0 +1,97 @@
+"""
+Unit tests for request coalescing
+"""
+import asyncio
+import threading
+import time
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight("test")
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", work))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_async_waiters_share_one_run():
+    async def scenario():
+        flight = AsyncSingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+        return results, calls, flight.in_flight()
+
+    results, calls, in_flight = asyncio.run(scenario())
+    assert results == ["result"] * 3
+    assert len(calls) == 1
+    assert in_flight == 0
+
+
+def test_one_waiter_leaving_keeps_the_run():
+    async def scenario():
+        flight = AsyncSingleFlight("test")
+        abandoned = []
+
+        async def work():
+            await asyncio.sleep(0.1)
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", work, on_abandoned=lambda: abandoned.append(1)))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, abandoned
+
+    result, abandoned = asyncio.run(scenario())
+    assert result == "result"
+    assert abandoned == []
+
+
+def test_retry_after_abandon_starts_a_fresh_run():
+    async def scenario():
+        flight = AsyncSingleFlight("test")
+        stopped = asyncio.Event()
+        runs = []
+
+        async def work():
+            runs.append(len(runs) + 1)
+            run = runs[-1]
+            # Like a crew run, the work stops only at its next checkpoint
+            while not (run == 1 and stopped.is_set()):
+                await asyncio.sleep(0.01)
+                if run == 2:
+                    return "fresh"
+            raise RuntimeError("abandoned run")
+
+        first = asyncio.ensure_future(flight.do("key", work, on_abandoned=stopped.set))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        # The abandoned run has not stopped yet; the retry must not join it
+        retry = await flight.do("key", work)
+        return retry, runs, stopped.is_set()
+
+    retry, runs, stopped = asyncio.run(scenario())
+    assert stopped
+    assert retry == "fresh"
+    assert runs == [1, 2]
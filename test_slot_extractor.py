@@ -0,0 +1,46 @@
+"""
+Unit tests for the symptom slot extractor
+"""
+import pytest
+
+from slot_extractor import SymptomSlots, extract_slots
+
+
+def test_extracts_error_code_onset_and_trigger():
+    slots = extract_slots("My EH222 shows error E5 since yesterday, it happens every time I open the door")
+    assert slots.error_code == "E5"
+    assert slots.onset == "since yesterday"
+    assert slots.trigger == "every time I open the door"
+
+
+def test_extracts_recent_change_and_intermittency():
+    slots = extract_slots("Error code: 12. It started 3 days ago after the firmware update. It keeps happening all the time")
+    assert slots.error_code == "12"
+    assert slots.onset == "3 days ago"
+    assert "firmware update" in slots.recent_change
+    assert slots.intermittency == "constant"
+    assert extract_slots("It stops now and then").intermittency == "intermittent"
+    assert extract_slots("nothing has changed").recent_change == "none"
+
+
+@pytest.mark.parametrize("text, code", [
+    ("error E5", "E5"),
+    ("Fault code: F-03", "F-03"),
+    ("code #e12", "E12"),
+    ("it shows error 404", "404"),
+    ("the error came back 2 times", None),
+    ("error 2 times today", None),
+    ("fault EH222", None),
+])
+def test_error_code(text, code):
+    assert extract_slots(text).error_code == code
+
+
+def test_model_number_is_not_an_error_code():
+    assert extract_slots("my EH222 is broken").filled() == {}
+
+
+def test_merge_keeps_existing_values():
+    slots = SymptomSlots(error_code="E5").merge(SymptomSlots(error_code="E7", onset="today"))
+    assert (slots.error_code, slots.onset) == ("E5", "today")
+    assert slots.answers() == {"symptoms": "Error code E5", "onset": "today"}